@@ -0,0 +1,177 @@
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from batching import Histogram
+
+# Defaults for the whole server; every worker process gets its share
+MAX_ACTIVE = 4
+MAX_QUEUED = 16
+# Retry-After guess while no request has finished yet: processing seconds per
+# second of audio
+DEFAULT_SECONDS_PER_COST = 0.5
+# Weight of the latest finished request in the moving average
+COST_EWMA_ALPHA = 0.2
+MAX_RETRY_AFTER = 3600
+WAIT_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+class AdmissionRejected(Exception):
+    """Raised when the admission queue is full; `retry_after` is in seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def worker_share(total: int, workers: int) -> int:
+    """One worker process's part of a limit meant for all `workers` together"""
+    return max(1, math.ceil(total / max(workers, 1)))
+
+
+class _Ticket:
+    def __init__(self, cost: float, start: Callable[[], Future]):
+        self.cost = cost
+        self.start = start
+        self.enqueued_at = time.monotonic()
+        self.admitted_at: Optional[float] = None
+        self.future: Future = Future()
+
+
+class AdmissionController:
+    """Bounded, shortest-job-first queue in front of the audio analysis.
+
+    At most `max_active` requests are processed at once and at most
+    `max_queued` wait; further requests are rejected with a Retry-After
+    estimate instead of being accepted and failing later. Waiting requests
+    are admitted in order of `cost` (seconds of audio) minus `aging_rate`
+    times the seconds they have waited. Every waiting request ages at the
+    same rate, so that order is the fixed heap key `cost + aging_rate *
+    enqueued_at`. A one-hour recording therefore overtakes newly arriving
+    two-minute ones after (3600 - 120) / aging_rate seconds.
+
+    Work is queued with `submit` and started by a dispatcher thread; a
+    request that needs the result waits on the returned future. The limits
+    are per process, so a server with several worker processes gives each
+    its `worker_share`.
+    """
+
+    def __init__(self, max_active: int = MAX_ACTIVE, max_queued: int = MAX_QUEUED, aging_rate: float = 10.0):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.aging_rate = aging_rate
+        self.wait_seconds = Histogram(WAIT_BUCKETS)
+        self.admitted = 0
+        self.rejected = 0
+        self._heap: List[tuple] = []
+        self._active: List[_Ticket] = []
+        self._order = itertools.count()
+        self._seconds_per_cost: Optional[float] = None
+        self._cond = threading.Condition()
+        self._dispatcher_pid: Optional[int] = None
+
+    def configure(
+        self,
+        max_active: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        aging_rate: Optional[float] = None,
+    ) -> None:
+        """Change limits before the first request, e.g. from the Flask config"""
+        if max_active is not None:
+            self.max_active = max_active
+        if max_queued is not None:
+            self.max_queued = max_queued
+        if aging_rate is not None:
+            self.aging_rate = aging_rate
+
+    def submit(self, cost: float, start: Callable[[], Future]) -> Future:
+        """Queue `start()` until admitted; the returned future resolves like the one it returns"""
+        return self._enqueue(_Ticket(cost, start)).future
+
+    def _enqueue(self, ticket: _Ticket) -> _Ticket:
+        self._ensure_dispatcher()
+        with self._cond:
+            if len(self._heap) >= self.max_queued:
+                self.rejected += 1
+                retry_after = self._retry_after()
+                raise AdmissionRejected(f"Too many queued requests ({len(self._heap)})", retry_after)
+            key = ticket.cost + self.aging_rate * ticket.enqueued_at
+            heapq.heappush(self._heap, (key, next(self._order), ticket))
+            self._cond.notify_all()
+        return ticket
+
+    def _ensure_dispatcher(self) -> None:
+        # Started per process, so a controller created before a fork works in the workers
+        with self._cond:
+            if self._dispatcher_pid != os.getpid():
+                self._dispatcher_pid = os.getpid()
+                threading.Thread(target=self._dispatch, name="admission-dispatcher", daemon=True).start()
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap or len(self._active) >= self.max_active:
+                    self._cond.wait()
+                _, _, ticket = heapq.heappop(self._heap)
+                ticket.admitted_at = time.monotonic()
+                self._active.append(ticket)
+                self.admitted += 1
+            self.wait_seconds.observe(ticket.admitted_at - ticket.enqueued_at)
+            self._start(ticket)
+
+    def _start(self, ticket: _Ticket) -> None:
+        try:
+            inner = ticket.start()
+        except Exception as e:
+            self._release(ticket)
+            ticket.future.set_exception(e)
+            return
+
+        def done(inner: Future) -> None:
+            self._release(ticket)
+            try:
+                ticket.future.set_result(inner.result())
+            except Exception as e:
+                ticket.future.set_exception(e)
+
+        inner.add_done_callback(done)
+
+    def _release(self, ticket: _Ticket) -> None:
+        seconds_per_cost = (time.monotonic() - ticket.admitted_at) / max(ticket.cost, 1.0)
+        with self._cond:
+            self._active.remove(ticket)
+            if self._seconds_per_cost is None:
+                self._seconds_per_cost = seconds_per_cost
+            else:
+                self._seconds_per_cost += COST_EWMA_ALPHA * (seconds_per_cost - self._seconds_per_cost)
+            self._cond.notify_all()
+
+    def _retry_after(self) -> int:
+        """Seconds until the work ahead is likely done, from recent processing speed"""
+        backlog = sum(ticket.cost for _, _, ticket in self._heap)
+        backlog += sum(ticket.cost for ticket in self._active)
+        rate = self._seconds_per_cost if self._seconds_per_cost is not None else DEFAULT_SECONDS_PER_COST
+        return min(MAX_RETRY_AFTER, max(1, math.ceil(backlog * rate / max(self.max_active, 1))))
+
+    def retry_after(self) -> int:
+        with self._cond:
+            return self._retry_after()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "active": len(self._active),
+                "queued": len(self._heap),
+                "queued_audio_seconds": sum(ticket.cost for _, _, ticket in self._heap),
+                "max_active": self.max_active,
+                "max_queued": self.max_queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "seconds_per_audio_second": self._seconds_per_cost,
+                "wait_seconds": self.wait_seconds.snapshot(),
+            }
@@ -1,43 +1,440 @@
-from flask import Flask, request, jsonify
-from summarization_openai import analyze_audio
+from flask import Flask, Response, request, jsonify
+from prometheus_client import CONTENT_TYPE_LATEST
+from summarization_openai import STAGES, AudioProcessor, Summary, TextAnalyzer
+from model_registry import whisper_registry
+from long_audio import long_audio_transcriber
+from keyphrases import topic_index
+from jobs import JobManager, JobQueueFull
+from admission import MAX_ACTIVE, MAX_QUEUED, AdmissionController, AdmissionRejected, worker_share
+from tiering import QUALITY_TIERS, model_selector
+from pipeline import build_audio_pipeline, submit_audio
+from result_cache import ResultCache
+from history import SummaryStore
+from openai_client import openai_client
+from warmup import WarmUp
+from uploads import remove_upload, save_upload
+from werkzeug.exceptions import HTTPException
+import metrics
+from functools import partial
 from pathlib import Path
-import openai
+from typing import Optional, Tuple
+import hashlib
+import hmac
+import time
 
 app = Flask(__name__)
 
 app.config.from_prefixed_env()
-openai.api_key = app.config["OPENAI_API_KEY"]
+openai_client.configure(
+    api_key=app.config["OPENAI_API_KEY"],
+    base_url=app.config.get("OPENAI_BASE_URL"),
+    requests_per_minute=app.config.get("OPENAI_RPM"),
+    tokens_per_minute=app.config.get("OPENAI_TPM"),
+    max_connections=app.config.get("OPENAI_MAX_CONNECTIONS"),
+    timeout=app.config.get("OPENAI_TIMEOUT"),
+)
 
-UPLOAD_FOLDER = Path("./uploads")
+# Uploads are streamed to uniquely named files here and deleted once processed;
+# bodies larger than MAX_CONTENT_LENGTH are refused before they are read
+UPLOAD_FOLDER = Path(app.config.get("UPLOAD_FOLDER", "./uploads"))
 UPLOAD_FOLDER.mkdir(exist_ok=True)
+if app.config.get("MAX_CONTENT_LENGTH") is None:
+    app.config["MAX_CONTENT_LENGTH"] = 200 * 1024 * 1024
+
+# Whisper models are shared by every request; the configured sizes are loaded
+# by the background warm-up below so the server can bind its port right away
+whisper_registry.configure(
+    device=app.config.get("WHISPER_DEVICE"),
+    idle_timeout=app.config.get("WHISPER_IDLE_TIMEOUT"),
+    backend=app.config.get("WHISPER_BACKEND"),
+)
+whisper_preload = app.config.get("WHISPER_PRELOAD", "base")
+warmup_steps = [("tokenizer", partial(TextAnalyzer.count_tokens, "warm up"))]
+if whisper_preload:
+    warmup_steps += [
+        (f"whisper-{name.strip()}", partial(AudioProcessor.warm_up, name.strip()))
+        for name in whisper_preload.split(",")
+    ]
+warm_up = WarmUp(warmup_steps)
+
+# Under gunicorn.conf.py the master imports this module once and forks the
+# workers from it. With a PyTorch backend on the CPU the models are then
+# loaded right here, before the fork, so all workers share their weights
+# copy-on-write; they are pinned, since a worker reloading one would get a
+# private copy. Sizes loaded later by a worker are private to it and are
+# evicted when idle as usual. (CUDA contexts and ONNX Runtime sessions do
+# not survive a fork; those load in every worker.) Threads do not survive a
+# fork either, so each worker starts its own in `start_background`.
+PREFORK = app.config.get("PREFORK", False)
+if PREFORK and whisper_registry.device == "cpu" and whisper_registry.backend != "onnx":
+    warm_up.run()
+    whisper_registry.pin_loaded()
+
+
+def start_background() -> None:
+    """Start this process's background threads; gunicorn.conf.py calls it in every worker"""
+    whisper_registry.start_reaper()
+    metrics.start_background()
+    # A no-op if the models were already loaded before the fork
+    warm_up.start()
+
+
+if not PREFORK:
+    start_background()
+
+# Each transcription uses the most accurate of WHISPER_MODELS that the request's
+# quality tier allows and that is predicted to meet its latency budget;
+# requests without a budget get WHISPER_BUDGET_RTF times their duration
+model_selector.configure(
+    models=app.config.get("WHISPER_MODELS"),
+    quality=app.config.get("WHISPER_QUALITY"),
+)
+WHISPER_BUDGET_RTF = app.config.get("WHISPER_BUDGET_RTF", 1.0)
+
+# Recordings longer than LONG_AUDIO_SECONDS are transcribed in parallel chunks
+# by LONG_AUDIO_WORKERS processes (0 keeps them on the shared model)
+long_audio_transcriber.configure(
+    workers=app.config.get("LONG_AUDIO_WORKERS"),
+    min_seconds=app.config.get("LONG_AUDIO_SECONDS"),
+)
+
+# Topic IDF statistics; new interviews are merged in and saved every few jobs
+topic_index.configure(
+    app.config.get("TOPIC_INDEX", "./topic_index.npz"),
+    save_every=app.config.get("TOPIC_INDEX_SAVE_EVERY"),
+)
+
+# Transcripts and summaries keyed on the SHA-256 of the uploaded audio
+result_cache = ResultCache(
+    app.config.get("CACHE_DIR", "./cache"),
+    max_bytes=app.config.get("CACHE_MAX_BYTES", 512 * 1024 * 1024),
+)
+
+# Every result is also kept per user for /api/history; writes are queued and
+# committed in batches by a background thread. Users are only trusted when the
+# Node.js backend signed their id with USER_SIGNING_SECRET
+USER_SIGNING_SECRET = app.config.get("USER_SIGNING_SECRET")
+USER_SIGNATURE_MAX_AGE = app.config.get("USER_SIGNATURE_MAX_AGE", 300)
+summary_store = SummaryStore(
+    app.config.get("HISTORY_DB", "./history.db"),
+    batch_size=app.config.get("HISTORY_BATCH_SIZE", 32),
+    flush_interval=app.config.get("HISTORY_FLUSH_SECONDS", 1.0),
+)
+
+# Jobs from /api/jobs run on a staged pipeline so transcription of one upload
+# overlaps with summarization of another; each stage has its own worker count.
+# Job state is kept in SQLite, so any worker process can answer a poll
+audio_pipeline = build_audio_pipeline(app.config.get("PIPELINE_WORKERS"))
+job_manager = JobManager(
+    STAGES,
+    app.config.get("JOB_DB", "./jobs.db"),
+    max_pending=app.config.get("JOB_MAX_PENDING", 32),
+)
+
+# Both audio endpoints share one admission queue: a few analyses run at once,
+# the shortest recordings waiting are admitted first, and uploads beyond the
+# queue bound get 429 with Retry-After. The limits are for the whole server;
+# under gunicorn.conf.py (which sets WORKERS) each worker process takes its share
+WORKERS = app.config.get("WORKERS", 1)
+admission = AdmissionController(
+    max_active=worker_share(app.config.get("ADMISSION_MAX_ACTIVE", MAX_ACTIVE), WORKERS),
+    max_queued=worker_share(app.config.get("ADMISSION_MAX_QUEUED", MAX_QUEUED), WORKERS),
+    aging_rate=app.config.get("ADMISSION_AGING_RATE", 10.0),
+)
+
+# Prometheus metrics at /metrics, merged over the gunicorn workers, plus
+# optional OTLP span export
+metrics.register_service(
+    metrics.ServiceCollector(
+        whisper_registry, result_cache, openai_client, audio_pipeline, admission, model_selector
+    )
+)
+metrics.configure_tracing(app.config.get("OTEL_EXPORTER_ENDPOINT"))
+
+
+@app.before_request
+def track_request():
+    metrics.REQUESTS_IN_FLIGHT.inc()
+
+
+@app.teardown_request
+def untrack_request(exc=None):
+    metrics.REQUESTS_IN_FLIGHT.dec()
+
+
+def summary_to_response(summary: Summary) -> dict:
+    return {
+        "summary": summary.summary,
+        "key_points": summary.key_points,
+        "topics_discussed": summary.topics_discussed,
+        "duration": summary.duration,
+        "transcript": summary.transcript,
+        "confidence_score": summary.confidence_score,
+        "speaker_count": summary.speaker_count,
+        "speaker_turns": summary.speaker_turns,
+        "segments": summary.segments,
+        "silence_removed": summary.silence_removed,
+        "audio_hash": summary.audio_hash,
+        "whisper_model": summary.whisper_model,
+        "whisper_model_reason": summary.whisper_model_reason,
+        "predicted_transcribe_seconds": summary.predicted_transcribe_seconds,
+        "transcribe_seconds": summary.transcribe_seconds,
+    }
+
+
+def too_busy(e: AdmissionRejected):
+    response = jsonify({"error": str(e), "retry_after": e.retry_after})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 429
+
+
+def transcription_options(duration: float) -> Tuple[Optional[float], Optional[str]]:
+    """Latency budget (seconds from now) and quality tier from the query string"""
+    quality = request.args.get("quality")
+    if quality is not None and quality not in QUALITY_TIERS:
+        raise ValueError(f"Unknown quality tier '{quality}', expected one of {tuple(QUALITY_TIERS)}")
+    budget = request.args.get("latency_budget")
+    if budget is None:
+        return (WHISPER_BUDGET_RTF * duration if WHISPER_BUDGET_RTF else None), quality
+    try:
+        budget = float(budget)
+    except ValueError:
+        raise ValueError(f"Invalid latency_budget '{budget}'")
+    if budget <= 0:
+        raise ValueError("latency_budget must be positive")
+    return budget, quality
+
+
+def remaining(budget: Optional[float], received: float) -> Optional[float]:
+    """What is left of a latency budget after waiting for admission"""
+    return None if budget is None else budget - (time.monotonic() - received)
+
+
+def current_user() -> Optional[str]:
+    """The user id signed by the Node.js backend, or None for anonymous callers"""
+    user_id = request.headers.get("X-User-Id")
+    timestamp = request.headers.get("X-User-Timestamp", "")
+    signature = request.headers.get("X-User-Signature", "")
+    if not USER_SIGNING_SECRET or not user_id:
+        return None
+    try:
+        if abs(time.time() - int(timestamp)) > USER_SIGNATURE_MAX_AGE:
+            return None
+    except ValueError:
+        return None
+    expected = hmac.new(
+        USER_SIGNING_SECRET.encode(), f"{user_id}.{timestamp}".encode(), hashlib.sha256
+    ).hexdigest()
+    return user_id if hmac.compare_digest(expected, signature) else None
+
+
+def anonymous():
+    return jsonify({"error": "History requires a user id signed by the backend"}), 401
+
+
+def record_summary(user_id: Optional[str], summary: Summary) -> dict:
+    """Response for a finished analysis, queued for the user's history if there is a user"""
+    response = summary_to_response(summary)
+    if user_id is not None:
+        summary_store.save(user_id, summary.audio_hash, dict(response, interview_date=summary.interview_date))
+    return response
+
+
+# Liveness: answers as soon as the process is serving requests
+@app.route("/api/healthcheck", methods=["GET"])
+def healthcheck():
+    return jsonify({"status": "alive"}), 200
+
+
+# Readiness: 503 until every model is loaded and has run a warm-up inference
+@app.route("/api/ready", methods=["GET"])
+def ready():
+    return jsonify(warm_up.status()), 200 if warm_up.ready else 503
 
 
 @app.route("/api/process_audio", methods=["POST"])
 def process_audio():
+    received = time.monotonic()
     try:
-        if "audio_file" not in request.files:
-            return jsonify({"error": {"No audio files provided"}}), 400
-        audio_file = request.files["audio_file"]
-        file_path = UPLOAD_FOLDER / audio_file.filename
-        audio_file.save(file_path)
-
-        # Run the summarization pipeline
-        summary = analyze_audio(str(file_path))
-
-        # Prepare response data
-        response_data = {
-            "summary": summary.summary,
-            "key_points": summary.key_points,
-            "topics_discussed": summary.topics_discussed,
-            "duration": summary.duration,
-            "transcript": summary.transcript,
-            "confidence_score": summary.confidence_score,
-            "speaker_count": summary.speaker_count,
-        }
-
-        return jsonify(response_data), 200
+        file_path = save_upload(request, UPLOAD_FOLDER, app.config["MAX_CONTENT_LENGTH"])
+    except HTTPException as e:
+        return jsonify({"error": e.description}), e.code
+    metrics.UPLOAD_BYTES.inc(file_path.stat().st_size)
+    try:
+        # The duration from the header is the cost the queue is ordered by
+        duration = AudioProcessor.get_audio_duration(str(file_path))
+        budget, quality = transcription_options(duration)
+    except ValueError as e:
+        remove_upload(file_path)
+        return jsonify({"error": str(e)}), 400
+    observer = metrics.observe_stages()
+    try:
+        # Same queue and pipeline as /api/jobs; only this request thread waits
+        future = admission.submit(
+            duration,
+            lambda: submit_audio(
+                audio_pipeline,
+                str(file_path),
+                observer,
+                cache=result_cache,
+                latency_budget=remaining(budget, received),
+                quality=quality,
+            ),
+        )
+        summary = future.result().result()
+        observer.end()
+
+        return jsonify(record_summary(current_user(), summary)), 200
+    except AdmissionRejected as e:
+        observer.end(e)
+        return too_busy(e)
     except Exception as e:
+        observer.end(e)
         return jsonify({"error": str(e)}), 500
+    finally:
+        remove_upload(file_path)
+
+
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    received = time.monotonic()
+    try:
+        file_path = save_upload(request, UPLOAD_FOLDER, app.config["MAX_CONTENT_LENGTH"])
+    except HTTPException as e:
+        return jsonify({"error": e.description}), e.code
+    metrics.UPLOAD_BYTES.inc(file_path.stat().st_size)
+    try:
+        duration = AudioProcessor.get_audio_duration(str(file_path))
+        budget, quality = transcription_options(duration)
+    except ValueError as e:
+        remove_upload(file_path)
+        return jsonify({"error": str(e)}), 400
+    user_id = current_user()
+
+    def start(progress):
+        observer = metrics.observe_stages(progress)
+        # The job stays "queued" until admitted to the pipeline
+        try:
+            future = admission.submit(
+                duration,
+                lambda: submit_audio(
+                    audio_pipeline,
+                    str(file_path),
+                    observer,
+                    cache=result_cache,
+                    latency_budget=remaining(budget, received),
+                    quality=quality,
+                ),
+            )
+        except Exception as e:
+            observer.end(e)
+            raise
+
+        def finished(future):
+            # The trace ends and the upload is deleted whether the job completes or fails
+            observer.end(future.exception())
+            remove_upload(file_path)
+
+        future.add_done_callback(finished)
+        return future
+
+    try:
+        job = job_manager.submit_future(start, lambda analysis: record_summary(user_id, analysis.result()))
+        return jsonify({"job_id": job.id, "status": job.status}), 202
+    except JobQueueFull as e:
+        remove_upload(file_path)
+        return jsonify({"error": str(e)}), 503
+    except AdmissionRejected as e:
+        remove_upload(file_path)
+        return too_busy(e)
+    except Exception as e:
+        remove_upload(file_path)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job.to_dict()), 200
+
+
+@app.route("/api/history", methods=["GET"])
+def history():
+    user_id = current_user()
+    if user_id is None:
+        return anonymous()
+    try:
+        page = summary_store.history(
+            user_id, request.args.get("limit", 20, type=int), request.args.get("cursor")
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    return jsonify(page), 200
+
+
+@app.route("/api/history/<int:record_id>", methods=["GET"])
+def history_record(record_id):
+    user_id = current_user()
+    if user_id is None:
+        return anonymous()
+    record = summary_store.get(user_id, record_id)
+    if record is None:
+        return jsonify({"error": "Unknown record id"}), 404
+    return jsonify(record), 200
+
+
+@app.route("/api/history/search", methods=["GET"])
+def history_search():
+    user_id = current_user()
+    if user_id is None:
+        return anonymous()
+    query = request.args.get("q", "")
+    if not query.strip():
+        return jsonify({"error": "Missing query parameter q"}), 400
+    results = summary_store.search(
+        user_id,
+        query,
+        limit=request.args.get("limit", 20, type=int),
+        offset=request.args.get("offset", 0, type=int),
+    )
+    return jsonify(results), 200
+
+
+@app.route("/api/history_stats", methods=["GET"])
+def history_stats():
+    return jsonify(summary_store.stats()), 200
+
+
+@app.route("/api/model_stats", methods=["GET"])
+def model_stats():
+    return jsonify({"whisper": whisper_registry.stats(), "tiers": model_selector.stats()}), 200
+
+
+@app.route("/api/cache_stats", methods=["GET"])
+def cache_stats():
+    return jsonify(result_cache.stats()), 200
+
+
+@app.route("/api/admission_stats", methods=["GET"])
+def admission_stats():
+    return jsonify(admission.stats()), 200
+
+
+@app.route("/api/pipeline_stats", methods=["GET"])
+def pipeline_stats():
+    return jsonify(audio_pipeline.stats()), 200
+
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({"error": e.description}), 413
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.generate(), mimetype=CONTENT_TYPE_LATEST)
 
 
 if __name__ == "__main__":
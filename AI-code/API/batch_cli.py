@@ -0,0 +1,145 @@
+"""Offline batch processing of a directory of recordings.
+
+Example:
+    python batch_cli.py archive/ --output results.jsonl --workers 8
+
+Each worker process loads the models once and then runs `analyze_audio` on
+its share of the files. Finished files are recorded in a manifest next to
+the output, so re-running the same command after a crash skips them.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Set
+
+from tiering import MODELS
+
+AUDIO_EXTENSIONS = (".wav", ".webm", ".mp3", ".m4a", ".ogg", ".flac")
+
+# Per-process state set up by `init_worker`
+_cache = None
+
+
+def init_worker(whisper_model: str, threads_per_worker: int, cache_dir: Optional[str]) -> None:
+    """Load models once per worker and pin intra-op threads to avoid oversubscription"""
+    global _cache
+    import torch
+    from model_registry import whisper_registry
+    from openai_client import openai_client
+    from result_cache import ResultCache
+    from tiering import model_selector
+
+    torch.set_num_threads(threads_per_worker)
+    openai_client.configure(
+        api_key=os.environ.get("OPENAI_API_KEY") or os.environ.get("FLASK_OPENAI_API_KEY")
+    )
+    # Every file is transcribed with this model, whatever the quality tier
+    model_selector.configure(models=whisper_model)
+    whisper_registry.preload([whisper_model])
+    if cache_dir:
+        _cache = ResultCache(cache_dir)
+
+
+def process_file(file_path: str) -> dict:
+    from summarization_openai import analyze_audio
+
+    start = time.perf_counter()
+    try:
+        summary = analyze_audio(file_path, cache=_cache)
+    except Exception as e:
+        return {
+            "file": file_path,
+            "status": "failed",
+            "error": str(e),
+            "elapsed": time.perf_counter() - start,
+        }
+    return {
+        "file": file_path,
+        "status": "done",
+        "result": json.loads(summary.json()),
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def load_manifest(manifest_path: Path) -> Set[str]:
+    """Files that already finished successfully in a previous run"""
+    done = set()
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Partial line written during a crash
+                if entry.get("status") == "done":
+                    done.add(entry["file"])
+    return done
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Analyze every recording in a directory")
+    parser.add_argument("input_dir", type=Path)
+    parser.add_argument("--output", type=Path, default=Path("results.jsonl"))
+    parser.add_argument("--manifest", type=Path, help="Defaults to <output>.manifest")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--whisper-model", default="base", choices=MODELS)
+    parser.add_argument("--cache-dir", help="Share a result cache between runs")
+    args = parser.parse_args(argv)
+
+    manifest_path = args.manifest or args.output.with_suffix(args.output.suffix + ".manifest")
+    done = load_manifest(manifest_path)
+    files = sorted(
+        str(path)
+        for path in args.input_dir.rglob("*")
+        if path.suffix.lower() in AUDIO_EXTENSIONS and str(path) not in done
+    )
+    print(f"{len(files)} files to process ({len(done)} already done)", file=sys.stderr)
+    if not files:
+        return 0
+
+    workers = max(1, min(args.workers, len(files)))
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+    processed = failed = 0
+    audio_seconds = 0.0
+    start = time.perf_counter()
+    with open(args.output, "a") as output, open(manifest_path, "a") as manifest, multiprocessing.Pool(
+        workers,
+        initializer=init_worker,
+        initargs=(args.whisper_model, threads_per_worker, args.cache_dir),
+    ) as pool:
+        for record in pool.imap_unordered(process_file, files):
+            if record["status"] == "done":
+                output.write(json.dumps(record["result"] | {"file": record["file"]}) + "\n")
+                output.flush()
+                audio_seconds += record["result"]["duration"]
+                processed += 1
+            else:
+                print(f"{record['file']}: {record['error']}", file=sys.stderr)
+                failed += 1
+            # The manifest is written after the result so a crash never marks
+            # a file as done without its output line
+            manifest.write(
+                json.dumps({"file": record["file"], "status": record["status"]}) + "\n"
+            )
+            manifest.flush()
+
+            elapsed = time.perf_counter() - start
+            files_per_minute = (processed + failed) / elapsed * 60
+            real_time_factor = elapsed / audio_seconds if audio_seconds else 0.0
+            print(
+                f"[{processed + failed}/{len(files)}] {files_per_minute:.1f} files/min, "
+                f"real-time factor {real_time_factor:.3f}",
+                file=sys.stderr,
+            )
+
+    print(f"Done: {processed} processed, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
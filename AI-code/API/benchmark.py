@@ -0,0 +1,216 @@
+"""Per-stage benchmark of the audio analysis pipeline.
+
+Example:
+    python benchmark.py --save-baseline benchmarks/baseline.json
+    python benchmark.py --baseline benchmarks/baseline.json --threshold 0.2
+
+Deterministic synthetic recordings of several durations and formats are
+generated, then every stage of `analyze_audio` is timed separately with its
+peak RSS and real-time factor. Whisper and GPT are replaced by fakes unless
+`--real-models` is given, so the suite runs offline.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import soundfile as sf
+
+import summarization_openai
+from summarization_openai import SAMPLE_RATE, STAGES, AudioAnalysis
+
+DEFAULT_DURATIONS = (10, 60, 300)
+DEFAULT_FORMATS = ("wav", "webm", "mp3")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def synthesize_speech_like(duration: float, seed: int = 0) -> np.ndarray:
+    """Deterministic audio alternating voiced bursts, noise and silence"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    # Pitch wanders between 100 and 220 Hz like a speaking voice
+    pitch = 160 + 60 * np.sin(2 * np.pi * 0.3 * t)
+    voiced = 0.3 * np.sin(2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE)
+    voiced += 0.1 * np.sin(4 * np.pi * np.cumsum(pitch) / SAMPLE_RATE)
+    # Syllable-rate envelope with pauses roughly every few seconds
+    envelope = (np.sin(2 * np.pi * 4 * t) > -0.2) * (np.sin(2 * np.pi * 0.15 * t) > -0.5)
+    audio = voiced * envelope + 0.01 * rng.standard_normal(len(t))
+    return audio.astype(np.float32)
+
+
+def write_fixture(directory: Path, duration: float, fmt: str) -> Path:
+    wav_path = directory / f"synthetic_{duration}s.wav"
+    if not wav_path.exists():
+        sf.write(wav_path, synthesize_speech_like(duration), SAMPLE_RATE)
+    if fmt == "wav":
+        return wav_path
+    path = wav_path.with_suffix(f".{fmt}")
+    if not path.exists():
+        subprocess.run(
+            ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", str(wav_path), str(path)],
+            check=True,
+        )
+    return path
+
+
+def install_fakes() -> None:
+    """Swap the model-backed stages for cheap deterministic stand-ins"""
+
+    def fake_transcribe(audio, model_name: str = "base"):
+        # Touch every sample once, like a model would, and emit ~2.5 words/s
+        seconds = len(audio) / SAMPLE_RATE
+        energy = float(np.abs(audio).mean()) if len(audio) else 0.0
+        sentence = "We talked about caching, databases and how to scale the service."
+        count = max(1, int(seconds * 2.5) // 11)
+        step = seconds / count
+        segments = [
+            {"start": i * step, "end": (i + 1) * step, "text": sentence} for i in range(count)
+        ]
+        return {"text": " ".join([sentence] * count), "confidence": energy, "segments": segments}
+
+    def fake_summary(text: str) -> str:
+        points = "\n".join(f"- {sentence}" for sentence in text.split(".")[:5] if sentence)
+        return f"1. **Key Points**: {points}\n2. **Key Questions Asked**: None"
+
+    summarization_openai.AudioProcessor.transcribe_segments = staticmethod(fake_transcribe)
+    summarization_openai.TextAnalyzer.generate_summary = staticmethod(fake_summary)
+
+
+def current_rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        # No procfs: fall back to the process-wide peak (kilobytes on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StageProfiler:
+    """Progress callback recording wall time and peak RSS of every stage"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.results: Dict[str, dict] = {}
+        self._current = None
+        self._peak = 0
+        self._started = 0.0
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self._current is not None:
+                self._peak = max(self._peak, current_rss())
+
+    def __call__(self, stage: str, state: str) -> None:
+        if state == "running":
+            self._current = stage
+            self._peak = current_rss()
+            self._started = time.perf_counter()
+        elif state == "done" and self._current == stage:
+            elapsed = time.perf_counter() - self._started
+            self._current = None
+            self.results[stage] = {
+                "seconds": elapsed,
+                "peak_rss_bytes": max(self._peak, current_rss()),
+            }
+
+    def close(self) -> None:
+        self._stop.set()
+
+
+def run_case(path: Path, repeat: int) -> Dict[str, dict]:
+    """Best-of-`repeat` timings for every stage of one recording"""
+    best: Dict[str, dict] = {}
+    for _ in range(repeat):
+        profiler = StageProfiler()
+        analysis = AudioAnalysis(str(path), profiler)
+        try:
+            analysis.decode()
+            analysis.transcribe()
+            analysis.summarize()
+            analysis.analyze()
+        finally:
+            profiler.close()
+        duration = analysis.transcription["duration"]
+        for stage, result in profiler.results.items():
+            result["real_time_factor"] = result["seconds"] / duration if duration else 0.0
+            if stage not in best or result["seconds"] < best[stage]["seconds"]:
+                best[stage] = result
+    return best
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta: float) -> List[str]:
+    """Cases whose stage time grew by more than `threshold` (and `min_delta` seconds)"""
+    regressions = []
+    for case, stages in results.items():
+        for stage, result in stages.items():
+            reference = baseline.get(case, {}).get(stage)
+            if reference is None:
+                continue
+            limit = max(reference["seconds"] * (1 + threshold), reference["seconds"] + min_delta)
+            if result["seconds"] > limit:
+                regressions.append(
+                    f"{case} {stage}: {result['seconds']:.4f}s vs baseline {reference['seconds']:.4f}s"
+                )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark every stage of analyze_audio")
+    parser.add_argument("--durations", type=float, nargs="+", default=DEFAULT_DURATIONS)
+    parser.add_argument("--formats", nargs="+", default=DEFAULT_FORMATS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--real-models", action="store_true", help="Use Whisper and GPT instead of fakes")
+    parser.add_argument("--fixtures", type=Path, help="Keep generated audio here (default: temp dir)")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON")
+    parser.add_argument("--save-baseline", type=Path, help="Store the results as the new baseline")
+    parser.add_argument("--baseline", type=Path, help="Fail if a stage regresses past this baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="Ignore slowdowns below this many seconds")
+    args = parser.parse_args(argv)
+
+    if not args.real_models:
+        install_fakes()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = args.fixtures or Path(tmp)
+        fixtures.mkdir(parents=True, exist_ok=True)
+        results = {}
+        for duration in args.durations:
+            for fmt in args.formats:
+                case = f"{fmt}-{duration:g}s"
+                results[case] = run_case(write_fixture(fixtures, duration, fmt), args.repeat)
+                summary = ", ".join(
+                    f"{stage} {results[case][stage]['seconds'] * 1000:.1f}ms"
+                    for stage in STAGES
+                    if stage in results[case]
+                )
+                print(f"{case}: {summary}", file=sys.stderr)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.baseline:
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.threshold, args.min_delta
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+from functools import lru_cache
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+# MFCC front end: 25 ms frames every 10 ms, 40 mel bands, coefficients 1-19
+# (c0 is the frame loudness, which says more about mic distance than voice)
+FRAME_SECONDS = 0.025
+HOP_SECONDS = 0.01
+N_MELS = 40
+N_MFCC = 20
+PRE_EMPHASIS = 0.97
+
+# Speaker embeddings are mean and std of the MFCCs over 1.5 s windows that
+# advance by half a window
+SEGMENT_FRAMES = 75
+# Frames quieter than the block's loud frames by more than this are pauses
+VOICED_RANGE_DB = 30.0
+# Windows with fewer voiced frames than this are not used for clustering
+MIN_VOICED_FRAMES = 40
+# Audio is processed in blocks of this many segments (60 s), so the frame
+# matrices stay the same size whatever the recording length
+BLOCK_SEGMENTS = 80
+
+MAX_SPEAKERS = 6
+# A split into k clusters is only accepted above this silhouette score
+MIN_SILHOUETTE = 0.3
+# Clusters holding less of the speech than this are noise, not a speaker
+MIN_SPEAKER_SHARE = 0.05
+# Silhouette scores are computed on a sample to keep the distance matrix small
+SILHOUETTE_SAMPLE = 1500
+KMEANS_ITERATIONS = 30
+
+
+def _n_fft(sample_rate: int) -> int:
+    """Smallest power of two that holds a whole frame (512 at 16 kHz)"""
+    return 1 << (int(FRAME_SECONDS * sample_rate) - 1).bit_length()
+
+
+@lru_cache(maxsize=4)
+def _filters(sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Mel filterbank (bins x mels) and DCT-II matrix (mels x coefficients)"""
+    n_fft = _n_fft(sample_rate)
+
+    def hz_to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+
+    def mel_to_hz(mel):
+        return 700 * (10 ** (mel / 2595) - 1)
+
+    mel_points = np.linspace(hz_to_mel(20), hz_to_mel(sample_rate / 2), N_MELS + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+    freqs = np.arange(n_fft // 2 + 1)
+    lower, center, upper = bins[:-2, None], bins[1:-1, None], bins[2:, None]
+    rising = (freqs - lower) / np.maximum(center - lower, 1)
+    falling = (upper - freqs) / np.maximum(upper - center, 1)
+    mel_filters = np.clip(np.minimum(rising, falling), 0, None).T.astype(np.float32)
+
+    n = np.arange(N_MELS)
+    dct = np.cos(np.pi / N_MELS * (n[:, None] + 0.5) * np.arange(N_MFCC)[None, :])
+    dct *= np.sqrt(2 / N_MELS)
+    return mel_filters, dct[:, 1:].astype(np.float32)
+
+
+def mfcc(audio: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """MFCCs (frames x 19) and log energy of a block of audio, one frame per hop"""
+    frame_length = int(FRAME_SECONDS * sample_rate)
+    hop = int(HOP_SECONDS * sample_rate)
+    if len(audio) < frame_length:
+        return np.zeros((0, N_MFCC - 1), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    emphasized = np.append(audio[:1], audio[1:] - PRE_EMPHASIS * audio[:-1]).astype(np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(emphasized, frame_length)[::hop]
+    spectrum = np.fft.rfft(frames * np.hamming(frame_length).astype(np.float32), _n_fft(sample_rate))
+    power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+    mel_filters, dct = _filters(sample_rate)
+    mel = np.log(power @ mel_filters + 1e-6)
+    return mel @ dct, 10 * np.log10(power.sum(1) + 1e-10)
+
+
+def iter_segment_stats(
+    audio: np.ndarray, sample_rate: int
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Per-segment voiced-frame counts, MFCC sums and sums of squares, one block at a time"""
+    frame_length = int(FRAME_SECONDS * sample_rate)
+    hop = int(HOP_SECONDS * sample_rate)
+    block = BLOCK_SEGMENTS * SEGMENT_FRAMES * hop
+    for start in range(0, len(audio), block):
+        # Extend the block so its last frame is complete; the next block's
+        # frames start exactly one hop after it
+        features, energy = mfcc(audio[start:start + block + frame_length - hop], sample_rate)
+        n_segments = len(features) // SEGMENT_FRAMES
+        if n_segments == 0:
+            return
+        # Pauses inside a window carry no voice, only room noise
+        voiced = energy > np.percentile(energy, 95) - VOICED_RANGE_DB
+        features = features[: n_segments * SEGMENT_FRAMES] * voiced[: n_segments * SEGMENT_FRAMES, None]
+        features = features.reshape(n_segments, SEGMENT_FRAMES, -1)
+        counts = voiced[: n_segments * SEGMENT_FRAMES].reshape(n_segments, SEGMENT_FRAMES).sum(1)
+        yield counts, features.sum(axis=1), (features ** 2).sum(axis=1)
+
+
+def embeddings(audio: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean and std of the voiced MFCC frames over 1.5 s windows, and the window indices kept"""
+    stats = list(iter_segment_stats(audio, sample_rate))
+    if not stats:
+        return np.zeros((0, 2 * (N_MFCC - 1)), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    counts, sums, squares = (np.concatenate(parts) for parts in zip(*stats))
+    if len(sums) > 1:
+        # Windows are pairs of adjacent segments
+        counts, sums, squares = counts[:-1] + counts[1:], sums[:-1] + sums[1:], squares[:-1] + squares[1:]
+    keep = np.flatnonzero(counts >= MIN_VOICED_FRAMES)
+    counts = counts[keep, None]
+    mean = sums[keep] / counts
+    std = np.sqrt(np.maximum(squares[keep] / counts - mean ** 2, 0))
+    return np.hstack((mean, std)), keep
+
+
+def _squared_distances(x: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    return np.maximum(
+        (x ** 2).sum(1)[:, None] - 2 * x @ centers.T + (centers ** 2).sum(1)[None, :], 0
+    )
+
+
+def kmeans(x: np.ndarray, k: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Labels and centers of k-means with k-means++ seeding"""
+    rng = np.random.default_rng(seed)
+    centers = [x[rng.integers(len(x))]]
+    for _ in range(1, k):
+        distances = _squared_distances(x, np.array(centers)).min(1)
+        total = distances.sum()
+        index = rng.choice(len(x), p=distances / total) if total > 0 else rng.integers(len(x))
+        centers.append(x[index])
+    centers = np.array(centers)
+    labels = np.zeros(len(x), dtype=np.int64)
+    for _ in range(KMEANS_ITERATIONS):
+        new_labels = _squared_distances(x, centers).argmin(1)
+        counts = np.bincount(new_labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, new_labels, x)
+        nonempty = counts > 0
+        centers[nonempty] = sums[nonempty] / counts[nonempty, None]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return labels, centers
+
+
+def silhouette(x: np.ndarray, labels: np.ndarray, k: int) -> float:
+    """Mean silhouette coefficient over all points"""
+    distances = np.sqrt(_squared_distances(x, x))
+    one_hot = np.eye(k, dtype=x.dtype)[labels]
+    counts = one_hot.sum(0)
+    # Mean distance from every point to every cluster; a point's own cluster
+    # excludes the point itself
+    totals = distances @ one_hot
+    own = totals[np.arange(len(x)), labels] / np.maximum(counts[labels] - 1, 1)
+    totals[np.arange(len(x)), labels] = np.inf
+    nearest = (totals / np.maximum(counts, 1)).min(1)
+    scores = (nearest - own) / np.maximum(np.maximum(own, nearest), 1e-9)
+    scores[counts[labels] <= 1] = 0
+    return float(scores.mean())
+
+
+def _smooth(labels: np.ndarray, k: int) -> np.ndarray:
+    """Majority vote over each label and its two neighbours, to drop one-window flips"""
+    if len(labels) < 3:
+        return labels
+    votes = np.eye(k, dtype=np.int32)[labels]
+    padded = np.vstack((votes[:1], votes, votes[-1:]))
+    return (padded[:-2] + padded[1:-1] + padded[2:]).argmax(1)
+
+
+def estimate_speakers(audio: np.ndarray, sample_rate: int) -> dict:
+    """Number of speakers and their turns (start/end in seconds of `audio`).
+
+    Every 1.5 s window of voiced frames becomes a mean/std MFCC embedding;
+    the embeddings are clustered with k-means for every k up to
+    MAX_SPEAKERS and the k with the best silhouette score wins, if any
+    beats MIN_SILHOUETTE.
+    """
+    x, windows = embeddings(audio, sample_rate)
+    segment_seconds = SEGMENT_FRAMES * HOP_SECONDS
+    if len(x) < 4:
+        turns = [{"speaker": 0, "start": 0.0, "end": len(audio) / sample_rate}] if len(x) else []
+        return {"speaker_count": 1 if len(x) else 0, "turns": turns}
+
+    x = (x - x.mean(0)) / np.maximum(x.std(0), 1e-6)
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(x), min(len(x), SILHOUETTE_SAMPLE), replace=False)
+
+    best_k, best_labels, best_score = 1, np.zeros(len(x), dtype=np.int64), MIN_SILHOUETTE
+    for k in range(2, min(MAX_SPEAKERS, len(x) - 1) + 1):
+        labels, _ = kmeans(x, k)
+        shares = np.bincount(labels, minlength=k) / len(labels)
+        if (shares < MIN_SPEAKER_SHARE).any():
+            continue
+        score = silhouette(x[sample], labels[sample], k)
+        if score > best_score:
+            best_k, best_labels, best_score = k, labels, score
+
+    labels = _smooth(best_labels, best_k)
+    changes = np.flatnonzero(np.diff(labels)) + 1
+    starts = np.concatenate(([0], changes))
+    boundaries = np.append(windows[starts] * segment_seconds, len(audio) / sample_rate)
+    boundaries[0] = 0.0
+    turns: List[dict] = [
+        {
+            "speaker": int(labels[start]),
+            "start": round(float(boundaries[i]), 2),
+            "end": round(float(boundaries[i + 1]), 2),
+        }
+        for i, start in enumerate(starts)
+    ]
+    return {"speaker_count": best_k, "turns": turns}
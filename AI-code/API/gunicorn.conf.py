@@ -0,0 +1,69 @@
+"""Production server: gunicorn -c gunicorn.conf.py app:app
+
+app.py is imported once by the master, which loads the Whisper models (and
+the tokenizer and topic index) before forking the workers. The workers then
+share the weights copy-on-write instead of loading a copy each. Every worker
+gets cpu_count / workers intra-op threads, so the workers together do not
+run more math threads than there are cores.
+"""
+import os
+import shutil
+
+import admission
+import serving
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+# app.py divides the admission limits among the workers
+os.environ.setdefault("FLASK_WORKERS", str(workers))
+# /api/process_audio holds its request thread while its recording is active
+# or queued, so each worker needs a thread for every admission slot and queue
+# place, plus a few for job polls and history reads; with fewer, uploads wait
+# for a thread and the queue never fills or reorders
+worker_class = "gthread"
+max_active = int(os.environ.get("FLASK_ADMISSION_MAX_ACTIVE", admission.MAX_ACTIVE))
+max_queued = int(os.environ.get("FLASK_ADMISSION_MAX_QUEUED", admission.MAX_QUEUED))
+admission_threads = admission.worker_share(max_active, workers) + admission.worker_share(max_queued, workers)
+threads = int(os.environ.get("GUNICORN_THREADS", 0)) or admission_threads + 4
+# Seconds a worker may go without a heartbeat before the master restarts it.
+# gthread workers send heartbeats from their main loop while requests run in
+# other threads, so this catches hung workers, not long requests
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 600))
+graceful_timeout = 60
+# GUNICORN_PRELOAD=0 makes every worker import app.py and load its own
+# models, e.g. to compare memory use (see "Concurrency vs memory")
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
+torch_threads = int(os.environ.get("TORCH_THREADS_PER_WORKER", 0)) or serving.threads_per_worker(workers)
+
+# Tells app.py to load the models now and leave its threads to `post_fork`
+os.environ.setdefault("FLASK_PREFORK", "true")
+# The master runs the warm-up inference single-threaded: OpenMP threads
+# started before a fork do not exist in the child
+serving.pin_threads(1)
+# Every worker keeps its Prometheus metrics in files here and /metrics merges
+# them; set before app.py imports prometheus_client, emptied on every start
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/ai-code-metrics")
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir)
+# Checks for a GPU through NVML instead of initializing CUDA, which a forked
+# child could not use
+os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+
+
+def when_ready(server):
+    serving.freeze_heap()
+    server.log.info(f"Forking {workers} workers with {torch_threads} torch threads each")
+
+
+def post_fork(server, worker):
+    serving.pin_threads(torch_threads)
+    from app import start_background
+
+    start_background()
+
+
+def child_exit(server, worker):
+    import metrics
+
+    metrics.mark_process_dead(worker.pid)
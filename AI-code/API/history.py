@@ -0,0 +1,277 @@
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    audio_hash TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    duration REAL,
+    summary TEXT NOT NULL,
+    key_points TEXT NOT NULL,
+    transcript TEXT NOT NULL,
+    details TEXT NOT NULL,
+    UNIQUE (user_id, audio_hash)
+);
+CREATE INDEX IF NOT EXISTS summaries_by_user
+    ON summaries (user_id, created_at DESC, id DESC);
+CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(
+    summary, key_points, transcript,
+    content='summaries', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS summaries_ai AFTER INSERT ON summaries BEGIN
+    INSERT INTO summaries_fts (rowid, summary, key_points, transcript)
+    VALUES (new.id, new.summary, new.key_points, new.transcript);
+END;
+CREATE TRIGGER IF NOT EXISTS summaries_ad AFTER DELETE ON summaries BEGIN
+    INSERT INTO summaries_fts (summaries_fts, rowid, summary, key_points, transcript)
+    VALUES ('delete', old.id, old.summary, old.key_points, old.transcript);
+END;
+CREATE TRIGGER IF NOT EXISTS summaries_au AFTER UPDATE ON summaries BEGIN
+    INSERT INTO summaries_fts (summaries_fts, rowid, summary, key_points, transcript)
+    VALUES ('delete', old.id, old.summary, old.key_points, old.transcript);
+    INSERT INTO summaries_fts (rowid, summary, key_points, transcript)
+    VALUES (new.id, new.summary, new.key_points, new.transcript);
+END;
+"""
+
+# Re-analyzing the same recording replaces the user's earlier record
+UPSERT = """
+INSERT INTO summaries
+    (user_id, audio_hash, created_at, duration, summary, key_points, transcript, details)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (user_id, audio_hash) DO UPDATE SET
+    created_at = excluded.created_at,
+    duration = excluded.duration,
+    summary = excluded.summary,
+    key_points = excluded.key_points,
+    transcript = excluded.transcript,
+    details = excluded.details
+"""
+
+LIST_COLUMNS = "s.id, s.audio_hash, s.created_at, s.duration, s.summary, s.key_points"
+# Matches in the summary and key points count for more than in the transcript
+BM25_WEIGHTS = (2.0, 1.5, 1.0)
+SNIPPET_TOKENS = 12
+MAX_PAGE_SIZE = 100
+
+# Columns of their own; everything else in a record is kept as JSON in `details`
+COLUMN_FIELDS = ("audio_hash", "duration", "summary", "key_points", "transcript")
+
+
+def match_query(text: str) -> str:
+    """FTS5 query for plain keywords: every word must occur, operators are not interpreted"""
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", text))
+
+
+def _parse_cursor(cursor: str) -> Tuple[float, int]:
+    """Inverse of the `next_cursor` of `SummaryStore.history`; raises ValueError if malformed"""
+    created_at, _, record_id = cursor.partition(":")
+    return float(created_at), int(record_id)
+
+
+def _list_item(row: tuple) -> dict:
+    record_id, audio_hash, created_at, duration, summary, key_points = row[:6]
+    return {
+        "id": record_id,
+        "audio_hash": audio_hash,
+        "created_at": created_at,
+        "duration": duration,
+        "summary": summary,
+        "key_points": json.loads(key_points),
+    }
+
+
+class SummaryStore:
+    """Summary history per user in SQLite, with full-text search.
+
+    Records are keyed on (user, audio hash). Summaries, key points and
+    transcripts are indexed by an external-content FTS5 table kept in sync
+    by triggers, so the text is stored once and keyword search is an index
+    lookup ranked by BM25. History pages are read from a (user, created_at)
+    index with keyset cursors, so later pages cost the same as the first.
+
+    `save` only queues the record. A writer thread, started on first use,
+    commits up to `batch_size` queued records per transaction, waiting at
+    most `flush_interval` seconds for a batch to fill.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        batch_size: int = 32,
+        flush_interval: float = 1.0,
+        max_queued: int = 10000,
+    ):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queued)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Schema on a short-lived connection: none is left open to be
+        # inherited by forked worker processes
+        connection = sqlite3.connect(self.path)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (and per process, after a fork)"""
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.connection = sqlite3.connect(self.path, timeout=30)
+            self._local.connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def save(self, user_id: str, audio_hash: str, record: dict) -> bool:
+        """Queue a record for the writer; False if the queue is full and it was dropped"""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((user_id, audio_hash, time.time(), record))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def flush(self) -> None:
+        """Block until every queued record is committed"""
+        self._queue.join()
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._writer is None or self._writer_pid != os.getpid():
+                self._writer = threading.Thread(target=self._loop, name="history-writer", daemon=True)
+                self._writer_pid = os.getpid()
+                self._writer.start()
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch: List[tuple]) -> None:
+        rows = []
+        for user_id, audio_hash, created_at, record in batch:
+            details = {key: value for key, value in record.items() if key not in COLUMN_FIELDS}
+            rows.append(
+                (
+                    user_id,
+                    audio_hash,
+                    created_at,
+                    record.get("duration"),
+                    record.get("summary") or "",
+                    json.dumps(record.get("key_points") or []),
+                    record.get("transcript") or "",
+                    json.dumps(details, default=str),
+                )
+            )
+        connection = self._connection()
+        try:
+            with connection:
+                connection.executemany(UPSERT, rows)
+        except sqlite3.Error:
+            with self._lock:
+                self.failed += len(rows)
+            return
+        with self._lock:
+            self.written += len(rows)
+            self.batches += 1
+
+    def history(self, user_id: str, limit: int = 20, cursor: Optional[str] = None) -> dict:
+        """A page of the user's records, newest first, and the cursor of the next page"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        if cursor:
+            created_at, record_id = _parse_cursor(cursor)
+            rows = self._connection().execute(
+                f"SELECT {LIST_COLUMNS} FROM summaries s WHERE user_id = ? AND (created_at, id) < (?, ?) "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (user_id, created_at, record_id, limit),
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                f"SELECT {LIST_COLUMNS} FROM summaries s WHERE user_id = ? "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (user_id, limit),
+            ).fetchall()
+        next_cursor = f"{rows[-1][2]!r}:{rows[-1][0]}" if len(rows) == limit else None
+        return {"items": [_list_item(row) for row in rows], "next_cursor": next_cursor}
+
+    def get(self, user_id: str, record_id: int) -> Optional[dict]:
+        """The full stored record, or None if the user has no such record"""
+        row = self._connection().execute(
+            f"SELECT {LIST_COLUMNS}, s.transcript, s.details FROM summaries s WHERE user_id = ? AND id = ?",
+            (user_id, record_id),
+        ).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[7])
+        record.update(_list_item(row), transcript=row[6])
+        return record
+
+    def search(self, user_id: str, text: str, limit: int = 20, offset: int = 0) -> dict:
+        """The user's records matching every keyword, best match first, with a snippet"""
+        query = match_query(text)
+        if not query:
+            return {"items": [], "total": 0}
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        connection = self._connection()
+        rows = connection.execute(
+            f"SELECT {LIST_COLUMNS}, "
+            f"snippet(summaries_fts, -1, '[', ']', '...', {SNIPPET_TOKENS}) "
+            "FROM summaries_fts JOIN summaries s ON s.id = summaries_fts.rowid "
+            "WHERE summaries_fts MATCH ? AND s.user_id = ? "
+            f"ORDER BY bm25(summaries_fts, {', '.join(map(str, BM25_WEIGHTS))}) LIMIT ? OFFSET ?",
+            (query, user_id, limit, max(0, offset)),
+        ).fetchall()
+        (total,) = connection.execute(
+            "SELECT count(*) FROM summaries_fts JOIN summaries s ON s.id = summaries_fts.rowid "
+            "WHERE summaries_fts MATCH ? AND s.user_id = ?",
+            (query, user_id),
+        ).fetchone()
+        return {
+            "items": [dict(_list_item(row), snippet=row[6]) for row in rows],
+            "total": total,
+        }
+
+    def stats(self) -> dict:
+        (records,) = self._connection().execute("SELECT count(*) FROM summaries").fetchone()
+        with self._lock:
+            return {
+                "records": records,
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "batches": self.batches,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "bytes": self.path.stat().st_size,
+            }
@@ -0,0 +1,172 @@
+import argparse
+import difflib
+import time
+from typing import Callable, List, Sequence
+
+# "fp32" is plain PyTorch, "int8" applies dynamic int8 quantization to the
+# Linear layers (CPU only), "onnx" runs an ONNX Runtime export via optimum
+BACKENDS = ("fp32", "int8", "onnx")
+
+
+def _check_backend(backend: str, device: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+    if backend != "fp32" and device != "cpu":
+        raise ValueError(f"The '{backend}' backend only runs on the CPU, not on '{device}'")
+
+
+def quantize_int8(model):
+    """Dynamically quantize every Linear layer of a float model to int8 weights"""
+    import torch
+
+    # Whisper subclasses nn.Linear only to cast weights for fp16; quantization
+    # refuses subclasses, and on CPU the plain class behaves the same
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _import_optimum():
+    try:
+        import optimum.onnxruntime
+    except ImportError:
+        raise RuntimeError("The 'onnx' backend needs `pip install optimum[onnxruntime]`")
+    return optimum.onnxruntime
+
+
+class OnnxWhisper:
+    """ONNX Runtime Whisper exposing the `transcribe` interface of openai-whisper models"""
+
+    def __init__(self, name: str):
+        from transformers import WhisperProcessor, pipeline
+
+        checkpoint = f"openai/whisper-{name}"
+        ort_model = _import_optimum().ORTModelForSpeechSeq2Seq.from_pretrained(checkpoint, export=True)
+        processor = WhisperProcessor.from_pretrained(checkpoint)
+        self._sampling_rate = processor.feature_extractor.sampling_rate
+        self._pipeline = pipeline(
+            "automatic-speech-recognition",
+            model=ort_model,
+            tokenizer=processor.tokenizer,
+            feature_extractor=processor.feature_extractor,
+            chunk_length_s=30,
+        )
+
+    def transcribe(self, audio, **kwargs) -> dict:
+        """Text and timed segments of a file path or 16 kHz buffer, as openai-whisper returns them"""
+        output = self._pipeline(audio, return_timestamps=True)
+        duration = None if isinstance(audio, str) else len(audio) / self._sampling_rate
+        segments = []
+        for chunk in output.get("chunks", []):
+            start, end = chunk["timestamp"]
+            # The pipeline leaves the end of a segment cut off by the audio's end open
+            if end is None:
+                end = duration if duration is not None else start
+            segments.append({"start": start, "end": end, "text": chunk["text"]})
+        return {"text": output["text"], "segments": segments}
+
+
+def load_whisper(name: str, device: str, backend: str = "fp32"):
+    """Load a Whisper model for `device` with the given backend"""
+    _check_backend(backend, device)
+    if backend == "onnx":
+        return OnnxWhisper(name)
+
+    import whisper
+
+    model = whisper.load_model(name, device=device)
+    if backend == "int8":
+        model = quantize_int8(model)
+    return model
+
+
+def load_bart(name: str, device: str, backend: str = "fp32"):
+    """Load a BART summarization model for `device` with the given backend"""
+    _check_backend(backend, device)
+    if backend == "onnx":
+        return _import_optimum().ORTModelForSeq2SeqLM.from_pretrained(name, export=True)
+
+    from transformers import BartForConditionalGeneration
+
+    model = BartForConditionalGeneration.from_pretrained(name).to(device).eval()
+    if backend == "int8":
+        model = quantize_int8(model)
+    return model
+
+
+def text_similarity(reference: str, candidate: str) -> float:
+    """Word-level similarity in [0, 1] between two outputs"""
+    return difflib.SequenceMatcher(None, reference.split(), candidate.split()).ratio()
+
+
+def parity_report(
+    reference: Callable[[object], str],
+    candidate: Callable[[object], str],
+    inputs: Sequence[object],
+) -> dict:
+    """Compare a backend against the fp32 reference on the same inputs"""
+    similarities: List[float] = []
+    reference_seconds = candidate_seconds = 0.0
+    for item in inputs:
+        start = time.perf_counter()
+        expected = reference(item)
+        reference_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        actual = candidate(item)
+        candidate_seconds += time.perf_counter() - start
+        similarities.append(text_similarity(expected, actual))
+    return {
+        "samples": len(similarities),
+        "mean_similarity": sum(similarities) / len(similarities) if similarities else 0.0,
+        "min_similarity": min(similarities, default=0.0),
+        "reference_seconds": reference_seconds,
+        "candidate_seconds": candidate_seconds,
+        "speedup": reference_seconds / candidate_seconds if candidate_seconds else 0.0,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check a CPU backend's output parity against fp32")
+    parser.add_argument("model", choices=("whisper", "bart"))
+    parser.add_argument("backend", choices=BACKENDS)
+    parser.add_argument("inputs", nargs="+", help="Audio files for whisper, text files for bart")
+    parser.add_argument("--name", help="Model size or checkpoint (default: base / facebook/bart-large-cnn)")
+    parser.add_argument("--min-similarity", type=float, default=0.9)
+    args = parser.parse_args(argv)
+
+    if args.model == "whisper":
+        name = args.name or "base"
+        reference_model = load_whisper(name, "cpu")
+        candidate_model = load_whisper(name, "cpu", args.backend)
+
+        def run(model):
+            return lambda path: model.transcribe(path, fp16=False)["text"]
+
+        inputs = args.inputs
+    else:
+        from transformers import BartTokenizer
+
+        name = args.name or "facebook/bart-large-cnn"
+        tokenizer = BartTokenizer.from_pretrained(name)
+        reference_model = load_bart(name, "cpu")
+        candidate_model = load_bart(name, "cpu", args.backend)
+
+        def run(model):
+            def summarize(text):
+                inputs = tokenizer(text, max_length=1024, truncation=True, return_tensors="pt")
+                ids = model.generate(inputs.input_ids, max_length=200, num_beams=4)
+                return tokenizer.decode(ids[0], skip_special_tokens=True)
+
+            return summarize
+
+        inputs = [open(path).read() for path in args.inputs]
+
+    report = parity_report(run(reference_model), run(candidate_model), inputs)
+    for key, value in report.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+    return 0 if report["mean_similarity"] >= args.min_similarity else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,271 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+
+from serving import process_alive, process_start_time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stages TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    pid INTEGER NOT NULL,
+    pid_started INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, finished_at);
+"""
+
+SAVE = """
+INSERT OR REPLACE INTO jobs
+    (id, status, stages, result, error, submitted_at, started_at, finished_at, pid, pid_started)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+COLUMNS = "id, status, stages, result, error, submitted_at, started_at, finished_at"
+
+
+class JobQueueFull(Exception):
+    """Raised when the job manager cannot accept more pending work"""
+
+
+class Job:
+    """State of one submitted audio analysis job"""
+
+    def __init__(self, job_id: str, stages: Iterable[str]):
+        self.id = job_id
+        self.status = "queued"
+        self.stages: Dict[str, str] = {stage: "pending" for stage in stages}
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "Job":
+        job_id, status, stages, result, error, submitted_at, started_at, finished_at = row
+        job = cls(job_id, ())
+        job.status = status
+        job.stages = json.loads(stages)
+        job.result = json.loads(result) if result is not None else None
+        job.error = error
+        job.submitted_at, job.started_at, job.finished_at = submitted_at, started_at, finished_at
+        return job
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> dict:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "stages": dict(self.stages),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """Tracks the progress of analysis jobs that run on the staged pipeline.
+
+    Job state is kept in SQLite, so a job submitted to one server worker
+    process can be polled through any other. The worker running a job
+    writes every change of its state, together with its PID and process
+    start time. Jobs left unfinished by a worker that exited are marked
+    failed when the manager starts and before every new job; the start
+    time tells a PID reused after a restart from the original worker.
+
+    `max_pending` caps how many jobs may wait or run in total, across all
+    workers, so uploads are refused early instead of piling up. Finished
+    jobs are kept for `retention` seconds.
+    """
+
+    def __init__(
+        self,
+        stages: Iterable[str],
+        path: Union[str, Path] = "./jobs.db",
+        max_pending: int = 32,
+        retention: float = 3600.0,
+    ):
+        self.stages = tuple(stages)
+        self.path = Path(path)
+        self.max_pending = max_pending
+        self.retention = retention
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._owner = (None, None)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Schema on a short-lived connection: none is left open to be
+        # inherited by forked worker processes
+        connection = sqlite3.connect(self.path)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(jobs)")}
+            if "pid_started" not in columns:
+                # Unfinished jobs from before this column are from an earlier run
+                with connection:
+                    connection.execute("ALTER TABLE jobs ADD COLUMN pid_started INTEGER")
+                    connection.execute(
+                        "UPDATE jobs SET status = 'failed', error = 'Server restarted', finished_at = ? "
+                        "WHERE status IN ('queued', 'running')",
+                        (time.time(),),
+                    )
+            # Jobs of workers from before a restart would otherwise count
+            # against max_pending until the next submission
+            with connection:
+                self._fail_orphans(connection)
+        finally:
+            connection.close()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (and per process, after a fork), in autocommit mode"""
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def _create(self) -> Job:
+        connection = self._connection()
+        # The write lock is taken up front so the count and the insert are
+        # atomic across worker processes
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._expire_finished(connection)
+            self._fail_orphans(connection)
+            (active,) = connection.execute(
+                "SELECT count(*) FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()
+            if active >= self.max_pending:
+                raise JobQueueFull(f"Too many pending jobs ({active})")
+            job = Job(uuid.uuid4().hex, self.stages)
+            self._write(connection, job)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return job
+
+    def submit_future(
+        self,
+        start: Callable[[Callable[[str, str], None]], Future],
+        to_result: Callable[[Any], dict],
+    ) -> Job:
+        """Track work that runs elsewhere, e.g. on a `pipeline.StagedPipeline`.
+
+        `start(progress)` must return a future; `to_result` turns its value
+        into the JSON-serializable job result.
+        """
+        job = self._create()
+        try:
+            future = start(self._progress(job))
+        except Exception as e:
+            self._fail(job, e)
+            raise
+
+        def done(future: Future) -> None:
+            try:
+                result = to_result(future.result())
+            except Exception as e:
+                self._fail(job, e)
+                return
+            self._complete(job, result)
+
+        future.add_done_callback(done)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._connection().execute(f"SELECT {COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def _process(self) -> Tuple[int, Optional[int]]:
+        """PID and start time of this process, written with every job it runs"""
+        if self._owner[0] != os.getpid():
+            self._owner = (os.getpid(), process_start_time(os.getpid()))
+        return self._owner
+
+    def _write(self, connection: sqlite3.Connection, job: Job) -> None:
+        connection.execute(
+            SAVE,
+            (
+                job.id,
+                job.status,
+                json.dumps(job.stages),
+                json.dumps(job.result) if job.result is not None else None,
+                job.error,
+                job.submitted_at,
+                job.started_at,
+                job.finished_at,
+                *self._process(),
+            ),
+        )
+
+    def _save(self, job: Job) -> None:
+        # Called with self._lock held, so writes of one job stay in order
+        self._write(self._connection(), job)
+
+    def _progress(self, job: Job) -> Callable[[str, str], None]:
+        def progress(stage: str, state: str) -> None:
+            with self._lock:
+                if job.status == "queued":
+                    job.status = "running"
+                    job.started_at = time.time()
+                job.stages[stage] = state
+                self._save(job)
+
+        return progress
+
+    def _complete(self, job: Job, result: dict) -> None:
+        with self._lock:
+            job.status = "completed"
+            job.result = result
+            job.finished_at = time.time()
+            self._save(job)
+
+    def _fail(self, job: Job, error: Exception) -> None:
+        with self._lock:
+            job.status = "failed"
+            job.error = str(error)
+            for stage, state in job.stages.items():
+                if state == "running":
+                    job.stages[stage] = "failed"
+            job.finished_at = time.time()
+            self._save(job)
+
+    def _expire_finished(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND finished_at < ?",
+            (time.time() - self.retention,),
+        )
+
+    def _fail_orphans(self, connection: sqlite3.Connection) -> None:
+        """Fail the unfinished jobs of worker processes that no longer exist"""
+        owners = connection.execute(
+            "SELECT DISTINCT pid, pid_started FROM jobs WHERE status IN ('queued', 'running')"
+        ).fetchall()
+        for pid, started in owners:
+            if not process_alive(pid, started):
+                connection.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                    "WHERE pid = ? AND pid_started IS ? AND status IN ('queued', 'running')",
+                    (f"Worker process {pid} exited before the job finished", time.time(), pid, started),
+                )
@@ -0,0 +1,354 @@
+"""TF-IDF keyphrase extraction backed by a document-frequency index.
+
+Example:
+    python keyphrases.py build results.jsonl transcripts/ --output topic_index.npz
+
+The index counts in how many interviews every 1-3 word phrase occurs. It is
+stored as two parallel NumPy arrays (sorted 64-bit phrase hashes and their
+document frequencies), so lookups for all candidates of a transcript are a
+single `searchsorted` and new interviews are merged in without a rebuild.
+"""
+import argparse
+import fcntl
+import hashlib
+import heapq
+import json
+import os
+import re
+import sys
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAX_NGRAM = 3
+TOP_K = 5
+# Longer phrases are more specific; weight them slightly above single words
+NGRAM_WEIGHTS = np.array([0.0, 1.0, 1.2, 1.3])
+# Without a file to save to, counts of new interviews are folded into the
+# main arrays once this many distinct phrases have accumulated
+MERGE_KEYS = 1 << 18
+
+TOKEN_RE = re.compile(r"[a-z][a-z0-9'-]*")
+# Sentence and clause punctuation; a phrase never spans it
+PUNCTUATION_RE = re.compile(r"[^\w\s'-]+")
+# Function words plus the fillers and hedges that dominate spoken transcripts
+STOP_WORDS = frozenset(
+    """
+    a about above after again against all also am an and any are aren't as at be because been
+    before being below between both but by can can't cannot could couldn't did didn't do does
+    doesn't doing don't down during each few for from further get gets getting go going gone got
+    had hadn't has hasn't have haven't having he he'd he'll he's her here here's hers herself him
+    himself his how how's i i'd i'll i'm i've if in into is isn't it it's its itself just let's
+    me more most mustn't my myself no nor not now of off on once only or other ought our ours
+    ourselves out over own same shan't she she'd she'll she's should shouldn't so some such than
+    that that's the their theirs them themselves then there there's these they they'd they'll
+    they're they've this those through to too under until up very was wasn't we we'd we'll we're
+    we've were weren't what what's when when's where where's which while who who's whom why why's
+    will with won't would wouldn't you you'd you'll you're you've your yours yourself yourselves
+    um uh uhm hmm yeah yes okay ok oh like know mean think really right actually basically kind
+    sort thing things stuff lot lots well maybe probably pretty much many way ways something
+    anything everything one two also said say says saying want wanted make made see
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def _is_content(token: str) -> bool:
+    return token not in STOP_WORDS and len(token) > 2
+
+
+def content_runs(text: str) -> List[List[str]]:
+    """Maximal runs of content words; punctuation and stop words end a run"""
+    runs = []
+    for clause in PUNCTUATION_RE.split(text.lower()):
+        run: List[str] = []
+        for token in TOKEN_RE.findall(clause):
+            if _is_content(token):
+                run.append(token)
+            elif run:
+                runs.append(run)
+                run = []
+        if run:
+            runs.append(run)
+    return runs
+
+
+def candidate_phrases(text: str, max_ngram: int = MAX_NGRAM) -> List[str]:
+    """Phrases of 1 to `max_ngram` content words within one run of `content_runs`"""
+    phrases = []
+    for run in content_runs(text):
+        for n in range(1, min(max_ngram, len(run)) + 1):
+            for start in range(len(run) - n + 1):
+                words = run[start:start + n]
+                # A word repeated within a phrase is a false start ("java java"), not a topic
+                if n == 1 or len(set(words)) == n:
+                    phrases.append(" ".join(words))
+    return phrases
+
+
+def _strip_stop_words(phrase: str) -> str:
+    tokens = tokenize(phrase)
+    while tokens and not _is_content(tokens[0]):
+        tokens.pop(0)
+    while tokens and not _is_content(tokens[-1]):
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def phrase_hashes(phrases: Iterable[str]) -> np.ndarray:
+    """Stable 64-bit keys for phrases (Python's own `hash` differs between processes)"""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(p.encode(), digest_size=8).digest(), "little") for p in phrases),
+        dtype=np.uint64,
+    )
+
+
+def merge_counts(
+    keys: np.ndarray, counts: np.ndarray, new_keys: np.ndarray, new_counts: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Add counts of sorted unique `new_keys` to sorted unique `keys` without re-sorting"""
+    positions = np.searchsorted(keys, new_keys)
+    found = positions < len(keys)
+    found[found] = keys[positions[found]] == new_keys[found]
+    counts = counts.copy()
+    counts[positions[found]] += new_counts[found]
+    missing = ~found
+    return (
+        np.insert(keys, positions[missing], new_keys[missing]),
+        np.insert(counts, positions[missing], new_counts[missing]),
+    )
+
+
+def _phrase_overlaps(phrase: Tuple[str, ...], other: Tuple[str, ...]) -> bool:
+    """Whether one phrase's words occur as a contiguous run in the other's"""
+    shorter, longer = sorted((phrase, other), key=len)
+    n = len(shorter)
+    return any(longer[i:i + n] == shorter for i in range(len(longer) - n + 1))
+
+
+EMPTY_KEYS = np.zeros(0, dtype=np.uint64)
+EMPTY_COUNTS = np.zeros(0, dtype=np.uint32)
+
+
+class TopicIndex:
+    """Document frequencies of candidate phrases over the interview corpus.
+
+    The vocabulary is a sorted `uint64` array of phrase hashes with a
+    parallel `uint32` array of document counts. Interviews added since the
+    last save are counted in a second, small pair of sorted arrays, so
+    adding one costs time in its own phrases, not in the vocabulary size;
+    lookups add up both. `save` merges these counts into the file under an
+    exclusive lock, on top of what other processes (e.g. the other server
+    workers) saved in the meantime. All arrays are swapped in as one tuple,
+    so `add_documents` can run in another thread while topics are being
+    extracted.
+    """
+
+    def __init__(self, path: Optional[str] = None, save_every: int = 20):
+        self.path = Path(path) if path else None
+        self.save_every = save_every
+        # (keys, doc_freq, n_docs) as of the last load or save, then the same
+        # for the interviews added since
+        self._state = (EMPTY_KEYS, EMPTY_COUNTS, 0, EMPTY_KEYS, EMPTY_COUNTS, 0)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            self.load(self.path)
+
+    @property
+    def n_docs(self) -> int:
+        return self._state[2] + self._state[5]
+
+    def configure(self, path: Optional[str] = None, save_every: Optional[int] = None) -> None:
+        """Point the index at a file, loading it if it exists"""
+        if save_every is not None:
+            self.save_every = save_every
+        if path:
+            self.path = Path(path)
+            if self.path.exists():
+                self.load(self.path)
+
+    @staticmethod
+    def _read(path: Path) -> Tuple[np.ndarray, np.ndarray, int]:
+        with np.load(path) as data:
+            return data["keys"], data["doc_freq"], int(data["n_docs"])
+
+    @staticmethod
+    def _write(path: Path, keys: np.ndarray, doc_freq: np.ndarray, n_docs: int) -> None:
+        # Written next to the target and renamed, so readers never see half a file
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, keys=keys, doc_freq=doc_freq, n_docs=n_docs)
+        os.replace(tmp, path)
+
+    def load(self, path: Path) -> None:
+        self._state = (*self._read(path), EMPTY_KEYS, EMPTY_COUNTS, 0)
+
+    def _fold(self) -> Tuple[np.ndarray, np.ndarray, int, np.ndarray, np.ndarray, int]:
+        """Move the counts added since the last save into the main arrays; returns those counts"""
+        with self._lock:
+            keys, doc_freq, n_docs, new_keys, new_freq, new_docs = self._state
+            keys, doc_freq = merge_counts(keys, doc_freq, new_keys, new_freq)
+            self._state = (keys, doc_freq, n_docs + new_docs, EMPTY_KEYS, EMPTY_COUNTS, 0)
+        return keys, doc_freq, n_docs + new_docs, new_keys, new_freq, new_docs
+
+    def save(self, path: Optional[Path] = None) -> None:
+        """Write the whole index to `path`, or merge what was added since the last save into `self.path`"""
+        if path is not None:
+            keys, doc_freq, n_docs = self._fold()[:3]
+            self._write(Path(path), keys, doc_freq, n_docs)
+            return
+        with self._save_lock:
+            _, _, _, new_keys, new_freq, new_docs = self._fold()
+            lock_path = self.path.with_name(self.path.name + ".lock")
+            with open(lock_path, "a") as lock:
+                # Other processes save into the same file; re-read it under
+                # the lock so their counts are kept, then add ours
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    if self.path.exists():
+                        keys, doc_freq, n_docs = self._read(self.path)
+                    else:
+                        keys, doc_freq, n_docs = EMPTY_KEYS, EMPTY_COUNTS, 0
+                    keys, doc_freq = merge_counts(keys, doc_freq, new_keys, new_freq)
+                    n_docs += new_docs
+                    self._write(self.path, keys, doc_freq, n_docs)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+            with self._lock:
+                self._state = (keys, doc_freq, n_docs, *self._state[3:])
+
+    def add_documents(self, texts: Iterable[str]) -> None:
+        """Count the phrases of new interviews"""
+        doc_keys = [np.unique(phrase_hashes(candidate_phrases(text))) for text in texts]
+        if not doc_keys:
+            return
+        added_keys, added_counts = np.unique(np.concatenate(doc_keys), return_counts=True)
+        with self._lock:
+            keys, doc_freq, n_docs, new_keys, new_freq, new_docs = self._state
+            new_keys, new_freq = merge_counts(new_keys, new_freq, added_keys, added_counts.astype(np.uint32))
+            self._state = (keys, doc_freq, n_docs, new_keys, new_freq, new_docs + len(doc_keys))
+            save = self.path is not None and new_docs + len(doc_keys) >= self.save_every
+            fold = self.path is None and len(new_keys) >= MERGE_KEYS
+        if save:
+            self.save()
+        elif fold:
+            self._fold()
+
+    def lookup(self, hashes: np.ndarray) -> Tuple[np.ndarray, int]:
+        """Document frequency of each hash (0 if unseen) and the corpus size"""
+        keys, doc_freq, n_docs, new_keys, new_freq, new_docs = self._state
+        found = np.zeros(len(hashes), dtype=np.uint32)
+        for table, counts in ((keys, doc_freq), (new_keys, new_freq)):
+            if len(table):
+                positions = np.minimum(np.searchsorted(table, hashes), len(table) - 1)
+                found += np.where(table[positions] == hashes, counts[positions], 0).astype(np.uint32)
+        return found, n_docs + new_docs
+
+    def top_phrases(
+        self, text: str, k: int = TOP_K, candidates: Optional[Sequence[str]] = None
+    ) -> List[str]:
+        """The `k` highest TF-IDF phrases of a transcript, best first.
+
+        `candidates` replaces the built-in n-gram candidates, e.g. with the
+        noun chunks of a spaCy parse.
+        """
+        if candidates is None:
+            candidates = candidate_phrases(text)
+        else:
+            candidates = [phrase for phrase in map(_strip_stop_words, candidates) if phrase]
+        if not candidates:
+            return []
+
+        phrases = np.array(candidates, dtype=object)
+        unique_hashes, first, term_freq = np.unique(
+            phrase_hashes(candidates), return_index=True, return_counts=True
+        )
+        doc_freq, n_docs = self.lookup(unique_hashes)
+        lengths = np.fromiter((phrases[i].count(" ") + 1 for i in first), dtype=np.int64, count=len(first))
+        idf = np.log((1 + n_docs) / (1 + doc_freq)) + 1
+        scores = term_freq * idf * NGRAM_WEIGHTS[np.minimum(lengths, MAX_NGRAM)]
+
+        # Best first; a phrase sharing a run of words with a better one
+        # ("garbage collection" and "collection") is skipped. Only the best
+        # few are pulled from a heap, more each time too many were skipped;
+        # equal scores keep candidate order
+        topics: List[Tuple[str, ...]] = []
+        scanned, pull = 0, 3 * k
+        while len(topics) < k and scanned < len(scores):
+            pull = min(pull, len(scores))
+            best = heapq.nsmallest(pull, range(len(scores)), key=lambda i: (-scores[i], i))
+            for i in best[scanned:]:
+                words = tuple(phrases[first[i]].split())
+                if any(_phrase_overlaps(words, chosen) for chosen in topics):
+                    continue
+                topics.append(words)
+                if len(topics) == k:
+                    break
+            scanned, pull = pull, 2 * pull
+        return [" ".join(words) for words in topics]
+
+    def stats(self) -> dict:
+        keys, doc_freq, n_docs, new_keys, new_freq, new_docs = self._state
+        return {
+            "documents": n_docs + new_docs,
+            "phrases": len(keys),
+            "unsaved_phrases": len(new_keys),
+            "bytes": keys.nbytes + doc_freq.nbytes + new_keys.nbytes + new_freq.nbytes,
+        }
+
+
+def read_corpus(paths: Iterable[Path]) -> Iterable[str]:
+    """Transcripts from .txt files and from JSONL files with a `transcript` field"""
+    for path in paths:
+        files = sorted(path.rglob("*")) if path.is_dir() else [path]
+        for file in files:
+            if file.suffix == ".txt":
+                yield file.read_text()
+            elif file.suffix == ".jsonl":
+                with open(file) as f:
+                    for line in f:
+                        try:
+                            transcript = json.loads(line).get("transcript")
+                        except ValueError:
+                            continue
+                        if transcript:
+                            yield transcript
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build or extend the topic IDF index")
+    parser.add_argument("command", choices=("build", "update", "stats"))
+    parser.add_argument("corpus", type=Path, nargs="*", help="Transcript .txt files, .jsonl results or directories")
+    parser.add_argument("--output", type=Path, default=Path("topic_index.npz"))
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    index = TopicIndex(args.output if args.command != "build" else None)
+    if args.command != "stats":
+        batch = []
+        for text in read_corpus(args.corpus):
+            batch.append(text)
+            if len(batch) >= args.batch_size:
+                index.add_documents(batch)
+                batch = []
+        index.add_documents(batch)
+        if args.command == "build":
+            index.save(args.output)
+        else:
+            index.save()
+    print(json.dumps(index.stats()), file=sys.stderr)
+    return 0
+
+
+# Shared index used by the pipelines; `configure` points it at a file
+topic_index = TopicIndex()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from model_registry import whisper_registry
+from vad import FRAME_SECONDS, frame_energy_db
+
+# Target chunk length; every cut is moved to the quietest frame within
+# SEARCH_SECONDS of the target so it falls into a pause, not into a word
+CHUNK_SECONDS = 120.0
+SEARCH_SECONDS = 10.0
+# Audio shared by neighbouring chunks, so a word cut at a seam is heard whole
+OVERLAP_SECONDS = 1.0
+
+
+def find_cut_points(
+    audio: np.ndarray, sample_rate: int, chunk_seconds: float = CHUNK_SECONDS
+) -> List[int]:
+    """Sample offsets at which to split `audio`, each placed in a local energy minimum"""
+    frame_length = int(FRAME_SECONDS * sample_rate)
+    energy = frame_energy_db(audio, frame_length)
+    chunk_frames = int(chunk_seconds / FRAME_SECONDS)
+    search_frames = int(SEARCH_SECONDS / FRAME_SECONDS)
+
+    cuts = []
+    previous = 0
+    # Stop once the rest would make a chunk shorter than half the target
+    while len(energy) - previous > chunk_frames + chunk_frames // 2:
+        target = previous + chunk_frames
+        window = energy[target - search_frames:target + search_frames]
+        previous = target - search_frames + int(np.argmin(window))
+        cuts.append(previous * frame_length)
+    return cuts
+
+
+def _init_worker(device: str, backend: str, threads: int) -> None:
+    import torch
+
+    torch.set_num_threads(threads)
+    whisper_registry.configure(device=device, backend=backend)
+
+
+def _transcribe_chunk(audio: np.ndarray, model_name: str) -> dict:
+    # Chunks are shorter than the long-audio threshold, so this never recurses
+    from summarization_openai import AudioProcessor
+
+    return AudioProcessor.transcribe_segments(audio, model_name)
+
+
+class ParallelTranscriber:
+    """Transcribes long recordings as silence-aligned chunks on a process pool.
+
+    One Whisper `transcribe` call walks its 30 second windows one after the
+    other. Recordings longer than `min_seconds` are instead cut into chunks
+    of about CHUNK_SECONDS at quiet frames, each chunk is transcribed in its
+    own worker process (every worker loads its own model and gets an equal
+    share of the CPU threads), and the results are stitched back together
+    with segment times relative to the full audio. Disabled while `workers`
+    is 0.
+    """
+
+    def __init__(self, workers: int = 0, min_seconds: float = 600.0):
+        self.workers = workers
+        self.min_seconds = min_seconds
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def configure(self, workers: Optional[int] = None, min_seconds: Optional[float] = None) -> None:
+        """Change settings before the first long recording, e.g. from the Flask config"""
+        if workers is not None:
+            self.workers = workers
+        if min_seconds is not None:
+            self.min_seconds = min_seconds
+
+    def should_chunk(self, seconds: float) -> bool:
+        return self.workers > 0 and seconds >= self.min_seconds
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        # Spawned rather than forked: the parent may already hold torch threads
+        # and a loaded model, neither of which survive a fork safely
+        with self._lock:
+            if self._pool is None:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                self._pool = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(whisper_registry.device, whisper_registry.backend, threads),
+                )
+            return self._pool
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int, model_name: str = "base") -> dict:
+        """Same result shape as `AudioProcessor.transcribe_segments`"""
+        bounds = [0] + find_cut_points(audio, sample_rate) + [len(audio)]
+        overlap = int(OVERLAP_SECONDS * sample_rate)
+        chunks: List[Tuple[int, int, int, int]] = [
+            (max(0, own_start - overlap), min(len(audio), own_end + overlap), own_start, own_end)
+            for own_start, own_end in zip(bounds[:-1], bounds[1:])
+        ]
+        pool = self._ensure_pool()
+        futures = [
+            pool.submit(_transcribe_chunk, audio[start:end], model_name) for start, end, _, _ in chunks
+        ]
+
+        segments = []
+        confidence = 0.0
+        for (start, end, own_start, own_end), future in zip(chunks, futures):
+            result = future.result()
+            confidence += result["confidence"] * (own_end - own_start)
+            offset = start / sample_rate
+            # A segment belongs to the chunk that owns its midpoint, so the
+            # overlap between two chunks is transcribed twice but kept once
+            for segment in result["segments"]:
+                if own_start <= (segment["start"] + segment["end"]) / 2 * sample_rate + start < own_end:
+                    segments.append(
+                        {
+                            "start": segment["start"] + offset,
+                            "end": segment["end"] + offset,
+                            "text": segment["text"],
+                        }
+                    )
+
+        return {
+            # Chunks run side by side on the pool's processes
+            "inference_seconds": sum(
+                future.result().get("inference_seconds", 0.0) for future in futures
+            ) / min(self.workers, len(futures)),
+            # Whisper segment texts carry their leading space
+            "text": "".join(segment["text"] for segment in segments).strip(),
+            "confidence": confidence / len(audio) if len(audio) else 0.0,
+            "segments": segments,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# Shared transcriber for the audio pipelines; enabled through `configure`
+long_audio_transcriber = ParallelTranscriber()
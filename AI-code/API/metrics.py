@@ -0,0 +1,357 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from prometheus_client.metrics_core import Metric
+
+from serving import process_alive
+
+# Set by gunicorn.conf.py before prometheus_client is imported. The metrics
+# below then live in files there, one per worker process, and /metrics
+# merges every worker's values instead of showing the one that answered
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+registry = CollectorRegistry()
+
+STAGE_SECONDS = Histogram(
+    "audio_stage_seconds",
+    "Wall time of each analyze_audio stage",
+    ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+    registry=registry,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled",
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+UPLOAD_BYTES = Counter("upload_bytes", "Bytes of uploaded audio", registry=registry)
+
+# Optional span tracing, enabled by `configure_tracing`
+_tracer = None
+
+
+def configure_tracing(endpoint: Optional[str], service_name: str = "ai-code") -> bool:
+    """Export stage spans over OTLP to a local collector if OpenTelemetry is installed"""
+    global _tracer
+    if not endpoint:
+        return False
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        return False
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    # Spans are exported from a background thread, off the request path
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer(__name__)
+    return True
+
+
+class StageObserver:
+    """Progress callback that times every stage (and traces it, if enabled).
+
+    Call `end` once the analysis has completed or failed; it closes the
+    request span and any stage span a failure left open.
+    """
+
+    def __init__(self, progress: Optional[Callable[[str, str], None]] = None, name: str = "analyze_audio"):
+        self.progress = progress
+        self._started = {}
+        self._spans = {}
+        self._root = _tracer.start_span(name) if _tracer is not None else None
+
+    def __call__(self, stage: str, state: str) -> None:
+        if state == "running":
+            self._started[stage] = time.perf_counter()
+            if self._root is not None:
+                from opentelemetry import trace
+
+                self._spans[stage] = _tracer.start_span(
+                    stage, context=trace.set_span_in_context(self._root)
+                )
+        elif stage in self._started:
+            STAGE_SECONDS.labels(stage).observe(time.perf_counter() - self._started.pop(stage))
+            span = self._spans.pop(stage, None)
+            if span is not None:
+                span.set_attribute("state", state)
+                span.end()
+        if self.progress is not None:
+            self.progress(stage, state)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self._root is None:
+            return
+        for span in self._spans.values():
+            span.set_attribute("state", "failed")
+            span.end()
+        self._spans.clear()
+        if error is not None:
+            self._root.record_exception(error)
+            self._root.set_attribute("error", True)
+        self._root.end()
+        self._root = None
+
+
+def observe_stages(
+    progress: Optional[Callable[[str, str], None]] = None, name: str = "analyze_audio"
+) -> StageObserver:
+    """Wrap a progress callback so every stage is timed (and traced, if enabled)"""
+    return StageObserver(progress, name)
+
+
+class ServiceCollector:
+    """Exposes the counters kept by the registry, cache, OpenAI client, pipeline, admission and tiering"""
+
+    def __init__(
+        self,
+        whisper_registry=None,
+        result_cache=None,
+        openai_client=None,
+        pipeline=None,
+        admission=None,
+        model_selector=None,
+    ):
+        self.whisper_registry = whisper_registry
+        self.result_cache = result_cache
+        self.openai_client = openai_client
+        self.pipeline = pipeline
+        self.admission = admission
+        self.model_selector = model_selector
+
+    def collect(self):
+        if self.whisper_registry is not None:
+            loads = CounterMetricFamily("whisper_model_loads", "Whisper model loads", labels=["model"])
+            load_seconds = CounterMetricFamily(
+                "whisper_model_load_seconds", "Time spent loading Whisper models", labels=["model"]
+            )
+            for name, stats in self.whisper_registry.stats().items():
+                loads.add_metric([name], stats["loads"])
+                load_seconds.add_metric([name], stats["total_load_seconds"])
+            yield loads
+            yield load_seconds
+
+        if self.result_cache is not None:
+            hits = CounterMetricFamily("result_cache_hits", "Result cache hits", labels=["layer"])
+            misses = CounterMetricFamily("result_cache_misses", "Result cache misses", labels=["layer"])
+            ratio = GaugeMetricFamily("result_cache_hit_ratio", "Result cache hit ratio", labels=["layer"])
+            for layer, stats in self.result_cache.stats()["layers"].items():
+                total = stats["hits"] + stats["misses"]
+                hits.add_metric([layer], stats["hits"])
+                misses.add_metric([layer], stats["misses"])
+                ratio.add_metric([layer], stats["hits"] / total if total else 0.0)
+            yield hits
+            yield misses
+            yield ratio
+
+        if self.openai_client is not None:
+            tokens = CounterMetricFamily("openai_tokens", "OpenAI tokens used", labels=["kind"])
+            usage = self.openai_client.usage
+            tokens.add_metric(["prompt"], usage["prompt_tokens"])
+            tokens.add_metric(["completion"], usage["completion_tokens"])
+            yield tokens
+            yield CounterMetricFamily("openai_requests", "OpenAI requests", value=usage["requests"])
+            yield CounterMetricFamily("openai_retries", "OpenAI retried requests", value=usage["retries"])
+
+        if self.pipeline is not None:
+            queued = GaugeMetricFamily("pipeline_queued", "Items waiting per stage", labels=["stage"])
+            utilization = GaugeMetricFamily(
+                "pipeline_utilization", "Busy fraction of each stage's workers", labels=["stage"]
+            )
+            for stage, stats in self.pipeline.stats().items():
+                queued.add_metric([stage], stats["queued"])
+                utilization.add_metric([stage], stats["utilization"])
+            yield queued
+            yield utilization
+
+        if self.admission is not None:
+            stats = self.admission.stats()
+            yield GaugeMetricFamily(
+                "admission_queued", "Requests waiting for admission", value=stats["queued"]
+            )
+            yield GaugeMetricFamily(
+                "admission_queued_audio_seconds",
+                "Seconds of audio waiting for admission",
+                value=stats["queued_audio_seconds"],
+            )
+            yield GaugeMetricFamily(
+                "admission_active", "Admitted requests being processed", value=stats["active"]
+            )
+            yield CounterMetricFamily("admission_admitted", "Admitted requests", value=stats["admitted"])
+            yield CounterMetricFamily(
+                "admission_rejected", "Requests rejected with 429", value=stats["rejected"]
+            )
+            wait = stats["wait_seconds"]
+            yield HistogramMetricFamily(
+                "admission_wait_seconds",
+                "Time requests waited for admission",
+                buckets=list(wait["buckets"].items()),
+                sum_value=wait["sum"],
+            )
+
+        if self.model_selector is not None:
+            rtf = GaugeMetricFamily(
+                "whisper_rtf", "Recent processing seconds per second of speech", labels=["model"]
+            )
+            for model, stats in self.model_selector.stats().items():
+                rtf.add_metric([model], stats["rtf"])
+            yield rtf
+
+
+# Micro-batchers shown at /metrics, by name; see `register_batcher`
+_batchers = {}
+
+
+def register_batcher(name: str, batcher) -> None:
+    """Expose the batch-size and queue-wait histograms of a `batching.MicroBatcher` at /metrics"""
+    _batchers[name] = batcher
+
+
+class BatcherCollector:
+    """Exposes the histograms of every batcher passed to `register_batcher`"""
+
+    def collect(self):
+        if not _batchers:
+            return
+        sizes = HistogramMetricFamily("batch_size", "Items per batched call", labels=["batcher"])
+        waits = HistogramMetricFamily(
+            "batch_queue_wait_seconds", "Time items waited to join a batch", labels=["batcher"]
+        )
+        for name, batcher in list(_batchers.items()):
+            size = batcher.batch_sizes.snapshot()
+            sizes.add_metric([name], list(size["buckets"].items()), sum_value=size["sum"])
+            wait = batcher.queue_wait.snapshot()
+            waits.add_metric([name], list(wait["buckets"].items()), sum_value=wait["sum"])
+        yield sizes
+        yield waits
+
+
+_batcher_collector = BatcherCollector()
+if not MULTIPROC_DIR:
+    registry.register(_batcher_collector)
+
+
+# Gauges that would be meaningless summed over workers; they are shown per
+# worker process instead
+PER_WORKER_GAUGES = ("result_cache_hit_ratio", "pipeline_utilization", "whisper_rtf")
+SNAPSHOT_SECONDS = 5.0
+
+
+class WorkerSnapshots:
+    """Merges a `ServiceCollector` and the batcher histograms over all worker processes.
+
+    The counters behind `ServiceCollector` are plain attributes of each
+    process. Every worker writes its samples to a JSON file in
+    `directory` every `interval` seconds and whenever it answers a scrape.
+    The scrape sums counters and histograms over every file, including
+    those of exited workers so counters never go backwards, and gauges over
+    the workers still running. `PER_WORKER_GAUGES` get a `pid` label instead.
+    """
+
+    def __init__(self, collector: ServiceCollector, directory: str, interval: float = SNAPSHOT_SECONDS):
+        self.collector = collector
+        self.directory = Path(directory)
+        self.interval = interval
+        self._writer_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start this process's snapshot writer; a no-op if it already runs"""
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+        threading.Thread(target=self._loop, name="metrics-snapshots", daemon=True).start()
+
+    def _loop(self) -> None:
+        while True:
+            self.write()
+            time.sleep(self.interval)
+
+    def write(self) -> None:
+        families = [
+            {
+                "name": family.name,
+                "type": family.type,
+                "documentation": family.documentation,
+                "samples": [[sample.name, sample.labels, sample.value] for sample in family.samples],
+            }
+            for collector in (self.collector, _batcher_collector)
+            for family in collector.collect()
+        ]
+        path = self.directory / f"service_{os.getpid()}.json"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(families))
+        os.replace(temporary, path)
+
+    def collect(self):
+        self.write()
+        merged = {}
+        for path in self.directory.glob("service_*.json"):
+            pid = int(path.stem.split("_")[1])
+            live = process_alive(pid)
+            try:
+                families = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            for family in families:
+                if family["type"] == "gauge" and not live:
+                    continue
+                _, samples = merged.setdefault(
+                    family["name"], ((family["type"], family["documentation"]), {})
+                )
+                for name, labels, value in family["samples"]:
+                    if family["name"] in PER_WORKER_GAUGES:
+                        labels = dict(labels, pid=str(pid))
+                    key = (name, tuple(sorted(labels.items())))
+                    samples[key] = samples.get(key, 0.0) + value
+        for family_name, ((typ, documentation), samples) in merged.items():
+            metric = Metric(family_name, documentation, typ)
+            for (name, labels), value in samples.items():
+                metric.add_sample(name, dict(labels), value)
+            yield metric
+
+
+_snapshots: Optional[WorkerSnapshots] = None
+
+
+def register_service(collector: ServiceCollector) -> None:
+    """Expose `collector` at /metrics, merged over worker processes in multiprocess mode"""
+    global _snapshots
+    if MULTIPROC_DIR:
+        _snapshots = WorkerSnapshots(collector, MULTIPROC_DIR)
+    else:
+        registry.register(collector)
+
+
+def start_background() -> None:
+    """Start this process's metrics threads; called in every server worker"""
+    if _snapshots is not None:
+        _snapshots.start()
+
+
+def generate() -> bytes:
+    """The /metrics body"""
+    if not MULTIPROC_DIR:
+        return generate_latest(registry)
+    scrape = CollectorRegistry()
+    multiprocess.MultiProcessCollector(scrape, MULTIPROC_DIR)
+    scrape.register(_snapshots if _snapshots is not None else _batcher_collector)
+    return generate_latest(scrape)
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop the live gauges of an exited worker; gunicorn.conf.py calls it from `child_exit`"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid, MULTIPROC_DIR)
@@ -0,0 +1,245 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from inference_backends import load_whisper
+
+
+def default_device() -> str:
+    """Pick CUDA when it is available, otherwise fall back to the CPU"""
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class LazyModel:
+    """Builds an object (model, tokenizer, ...) on first use instead of at import time"""
+
+    def __init__(self, factory: Callable[[], object]):
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not None
+
+    def get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self._factory()
+        return self._value
+
+
+class _ModelEntry:
+    """Bookkeeping for a single loaded model size"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.model = None
+        self.refcount = 0
+        self.load_lock = threading.Lock()
+        # Whisper installs kv-cache hooks on the model for every decode, so
+        # two threads must never run inference on the same instance at once.
+        self.inference_lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self.acquires = 0
+        self.last_load_seconds = 0.0
+        self.total_load_seconds = 0.0
+        self.last_used = 0.0
+        # Kept loaded regardless of `idle_timeout`
+        self.pinned = False
+
+
+class ModelHandle:
+    """Refcounted reference to a registry model; release it (or use `with`) when done"""
+
+    def __init__(self, registry: "WhisperModelRegistry", entry: _ModelEntry):
+        self._registry = registry
+        self._entry = entry
+        self._released = False
+        # Seconds spent inside `model.transcribe`, without the wait for the lock
+        self.inference_seconds = 0.0
+
+    @property
+    def name(self) -> str:
+        return self._entry.name
+
+    @property
+    def model(self):
+        if self._released:
+            raise RuntimeError(f"Handle for Whisper model '{self.name}' was already released")
+        return self._entry.model
+
+    def transcribe(self, audio, **kwargs) -> dict:
+        """Run `model.transcribe` while holding the model's inference lock"""
+        with self._entry.inference_lock:
+            start = time.perf_counter()
+            try:
+                return self.model.transcribe(audio, **kwargs)
+            finally:
+                self.inference_seconds += time.perf_counter() - start
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._registry._release(self._entry)
+
+    def __enter__(self) -> "ModelHandle":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+class WhisperModelRegistry:
+    """Process-wide cache that loads each Whisper model size once.
+
+    Models are handed out as refcounted `ModelHandle`s. A model that nobody
+    holds and that has not been used for `idle_timeout` seconds is evicted
+    the next time the registry is touched (or by the optional reaper thread).
+    """
+
+    def __init__(
+        self,
+        device: Optional[str] = None,
+        idle_timeout: Optional[float] = 600.0,
+        loader: Optional[Callable[[str, str], object]] = None,
+        backend: str = "fp32",
+    ):
+        self._device = device
+        self.idle_timeout = idle_timeout
+        self.backend = backend
+        self._loader = loader or (lambda name, device: load_whisper(name, device, self.backend))
+        self._entries: Dict[str, _ModelEntry] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stop_reaper = threading.Event()
+
+    @property
+    def device(self) -> str:
+        if self._device is None:
+            self._device = default_device()
+        return self._device
+
+    def configure(
+        self,
+        device: Optional[str] = None,
+        idle_timeout: Optional[float] = None,
+        backend: Optional[str] = None,
+    ) -> None:
+        """Override device placement, idle timeout or inference backend; call before the first load"""
+        if device is not None:
+            self._device = device
+        if idle_timeout is not None:
+            self.idle_timeout = idle_timeout
+        if backend is not None:
+            self.backend = backend
+        if idle_timeout is not None:
+            self.idle_timeout = idle_timeout
+
+    def acquire(self, name: str = "base") -> ModelHandle:
+        """Return a handle to model `name`, loading it on first use"""
+        self.evict_idle()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = _ModelEntry(name)
+            # Taking the reference before loading keeps the eviction pass
+            # from dropping a model another thread is still waiting on.
+            entry.refcount += 1
+            entry.acquires += 1
+            entry.last_used = time.monotonic()
+
+        try:
+            with entry.load_lock:
+                if entry.model is None:
+                    start = time.perf_counter()
+                    entry.model = self._loader(name, self.device)
+                    elapsed = time.perf_counter() - start
+                    entry.loads += 1
+                    entry.last_load_seconds = elapsed
+                    entry.total_load_seconds += elapsed
+        except Exception as e:
+            self._release(entry)
+            raise RuntimeError(f"Loading Whisper model '{name}' failed: {str(e)}")
+        return ModelHandle(self, entry)
+
+    def preload(self, names: Iterable[str] = ("base",)) -> None:
+        """Load the given model sizes up front, e.g. at process startup"""
+        for name in names:
+            self.acquire(name).release()
+
+    def pin_loaded(self) -> List[str]:
+        """Exempt every model loaded so far from idle eviction, e.g. before forking workers that share it"""
+        with self._lock:
+            pinned = [name for name, entry in self._entries.items() if entry.model is not None]
+            for name in pinned:
+                self._entries[name].pinned = True
+        return pinned
+
+    def _release(self, entry: _ModelEntry) -> None:
+        with self._lock:
+            entry.refcount = max(entry.refcount - 1, 0)
+            entry.last_used = time.monotonic()
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        """Drop models that are unreferenced and idle longer than `idle_timeout`"""
+        if self.idle_timeout is None:
+            return []
+        now = time.monotonic() if now is None else now
+        evicted = []
+        with self._lock:
+            for entry in self._entries.values():
+                if (
+                    entry.model is not None
+                    and not entry.pinned
+                    and entry.refcount == 0
+                    and now - entry.last_used > self.idle_timeout
+                ):
+                    entry.model = None
+                    entry.evictions += 1
+                    evicted.append(entry.name)
+        return evicted
+
+    def start_reaper(self, interval: float = 60.0) -> None:
+        """Run `evict_idle` periodically on a daemon thread"""
+        if self._reaper is not None:
+            return
+        self._stop_reaper.clear()
+
+        def reap():
+            while not self._stop_reaper.wait(interval):
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name="whisper-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop_reaper(self) -> None:
+        self._stop_reaper.set()
+        self._reaper = None
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-model load counts and timings, to confirm cold starts happen once"""
+        with self._lock:
+            return {
+                name: {
+                    "loaded": entry.model is not None,
+                    "pinned": entry.pinned,
+                    "device": self._device,
+                    "backend": self.backend,
+                    "refcount": entry.refcount,
+                    "acquires": entry.acquires,
+                    "loads": entry.loads,
+                    "evictions": entry.evictions,
+                    "last_load_seconds": entry.last_load_seconds,
+                    "total_load_seconds": entry.total_load_seconds,
+                }
+                for name, entry in self._entries.items()
+            }
+
+
+# Shared registry used by the audio pipelines
+whisper_registry = WhisperModelRegistry()
@@ -0,0 +1,186 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Dict, List, Optional, TypeVar
+
+import httpx
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+
+
+class OpenAIError(RuntimeError):
+    """Raised when a chat completion fails after all retries"""
+
+
+class TokenBucket:
+    """Async token bucket holding up to `capacity` units, refilled evenly over a minute"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Rough prompt size (about four characters per token) for the rate limiter"""
+    return sum(len(message["content"]) for message in messages) // 4 + 4 * len(messages)
+
+
+class OpenAIClient:
+    """Pooled, rate-limited async client for the chat completions endpoint.
+
+    Requests share one `httpx.AsyncClient` (persistent keep-alive
+    connections) running on a private event loop thread, so synchronous
+    callers such as the Flask handlers and pipeline workers can use
+    `chat_completion_sync`. Requests-per-minute and tokens-per-minute
+    buckets keep bursts under the account quota; 429s, 5xx responses and
+    transport errors are retried with jittered exponential backoff.
+    `base_url` can point at a local stub server for testing.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = DEFAULT_BASE_URL,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 40000,
+        max_connections: int = 16,
+        timeout: float = 120.0,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.usage = {"prompt_tokens": 0, "completion_tokens": 0, "requests": 0, "retries": 0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._request_bucket: Optional[TokenBucket] = None
+        self._token_bucket: Optional[TokenBucket] = None
+        self._lock = threading.Lock()
+
+    def configure(self, **settings) -> None:
+        """Change settings before the first request, e.g. from the Flask config"""
+        for name, value in settings.items():
+            if value is not None:
+                setattr(self, name, value)
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        # Started lazily so a process that forks workers after import does not
+        # hand them a loop thread that only exists in the parent
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="openai-client", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def _ensure_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._request_bucket = TokenBucket(self.requests_per_minute)
+            self._token_bucket = TokenBucket(self.tokens_per_minute)
+        return self._client
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Full jitter spreads out retries from concurrent requests
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float = 0.5,
+        max_tokens: int = 1000,
+        timeout: Optional[float] = None,
+    ) -> dict:
+        client = await self._ensure_client()
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            await self._request_bucket.acquire()
+            await self._token_bucket.acquire(estimate_tokens(messages) + max_tokens)
+            retry_after = None
+            try:
+                response = await client.post(
+                    "/chat/completions",
+                    json=payload,
+                    headers=headers,
+                    timeout=timeout or self.timeout,
+                )
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                last_error = f"{type(e).__name__}: {str(e)}"
+            else:
+                if response.status_code == 200:
+                    data = response.json()
+                    usage = data.get("usage", {})
+                    self.usage["requests"] += 1
+                    self.usage["prompt_tokens"] += usage.get("prompt_tokens", 0)
+                    self.usage["completion_tokens"] += usage.get("completion_tokens", 0)
+                    return data
+                last_error = f"HTTP {response.status_code}: {response.text}"
+                if response.status_code not in RETRY_STATUS_CODES:
+                    break
+                retry_after = response.headers.get("retry-after")
+            if attempt < self.max_retries:
+                self.usage["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        raise OpenAIError(f"Chat completion failed: {last_error}")
+
+    def run_sync(self, coro: Awaitable[T]) -> T:
+        """Run a coroutine on the client's event loop and wait for its result"""
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def chat_completion_sync(self, messages: List[Dict[str, str]], model: str, **kwargs) -> dict:
+        """Blocking wrapper for callers that are not running an event loop"""
+        return self.run_sync(self.chat_completion(messages, model, **kwargs))
+
+
+# Shared client used by the summarization pipeline
+openai_client = OpenAIClient()
@@ -0,0 +1,144 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from result_cache import ResultCache
+from summarization_openai import AudioAnalysis
+
+
+class Stage:
+    """One pipeline step with its own bounded input queue and worker threads"""
+
+    def __init__(self, name: str, run: Callable[[Any], None], workers: int = 1, queue_size: int = 4):
+        self.name = name
+        self.run = run
+        self.workers = workers
+        self.queue: "queue.Queue[tuple]" = queue.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.active = 0
+        self.lock = threading.Lock()
+
+
+class StagedPipeline:
+    """Runs items through a chain of stages, each with its own concurrency.
+
+    Every stage pulls from a bounded queue and pushes into the next stage's
+    queue, blocking when it is full, so a slow stage applies back-pressure
+    instead of letting decoded audio pile up in memory. Because stages run
+    independently, item N+1 can be transcribed while item N is still
+    waiting on summarization.
+
+    Worker threads are started by the first `submit` in each process, so a
+    pipeline built before a server forks its workers still runs in them.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        self.started_at = time.monotonic()
+        self._started_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            for index, stage in enumerate(self.stages):
+                next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+                for worker in range(stage.workers):
+                    threading.Thread(
+                        target=self._work,
+                        args=(stage, next_stage),
+                        name=f"pipeline-{stage.name}-{worker}",
+                        daemon=True,
+                    ).start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item; the future resolves to the item after the last stage"""
+        self._ensure_started()
+        future: Future = Future()
+        self.stages[0].queue.put((item, future))
+        return future
+
+    def _work(self, stage: Stage, next_stage: Optional[Stage]) -> None:
+        while True:
+            item, future = stage.queue.get()
+            start = time.monotonic()
+            with stage.lock:
+                stage.active += 1
+            try:
+                stage.run(item)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            finally:
+                with stage.lock:
+                    stage.active -= 1
+                    stage.processed += 1
+                    stage.busy_seconds += time.monotonic() - start
+            if next_stage is None:
+                future.set_result(item)
+            else:
+                next_stage.queue.put((item, future))
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-stage throughput and how busy its workers have been"""
+        elapsed = time.monotonic() - self.started_at
+        stats = {}
+        for stage in self.stages:
+            with stage.lock:
+                stats[stage.name] = {
+                    "workers": stage.workers,
+                    "active": stage.active,
+                    "queued": stage.queue.qsize(),
+                    "processed": stage.processed,
+                    "busy_seconds": stage.busy_seconds,
+                    "utilization": stage.busy_seconds / (elapsed * stage.workers) if elapsed else 0.0,
+                }
+        return stats
+
+
+# Default worker counts: Whisper is CPU-bound, the GPT call is network-bound
+DEFAULT_CONCURRENCY = {"decode": 2, "transcribe": 1, "summarize": 4, "analyze": 2}
+
+
+def build_audio_pipeline(
+    concurrency: Optional[Dict[str, int]] = None,
+    queue_size: int = 4,
+) -> StagedPipeline:
+    """Pipeline over `AudioAnalysis` items: decode -> transcribe -> summarize -> analyze"""
+    workers = dict(DEFAULT_CONCURRENCY, **(concurrency or {}))
+    # Topic extraction and speaker counting are independent, so the analyze
+    # stage runs them side by side on this pool
+    analyzer_pool = ThreadPoolExecutor(
+        max_workers=2 * workers["analyze"], thread_name_prefix="pipeline-analyzers"
+    )
+    return StagedPipeline(
+        [
+            Stage("decode", AudioAnalysis.decode, workers["decode"], queue_size),
+            Stage("transcribe", AudioAnalysis.transcribe, workers["transcribe"], queue_size),
+            Stage("summarize", AudioAnalysis.summarize, workers["summarize"], queue_size),
+            Stage(
+                "analyze",
+                lambda analysis: analysis.analyze(analyzer_pool),
+                workers["analyze"],
+                queue_size,
+            ),
+        ]
+    )
+
+
+def submit_audio(
+    pipeline: StagedPipeline,
+    file_path: str,
+    progress: Optional[Callable[[str, str], None]] = None,
+    cache: Optional[ResultCache] = None,
+    latency_budget: Optional[float] = None,
+    quality: Optional[str] = None,
+) -> Future:
+    """Queue a recording; the future resolves to its `AudioAnalysis`"""
+    return pipeline.submit(AudioAnalysis(file_path, progress, cache, latency_budget, quality))
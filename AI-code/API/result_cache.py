@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+CHUNK_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def hash_file(file_path: Union[str, Path]) -> str:
+    """SHA-256 of a file's bytes, read in chunks so large uploads are not held in memory"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Content-addressed on-disk cache for pipeline results.
+
+    Entries live under `<root>/<layer>/` (e.g. `transcript`, `summary`) as
+    JSON files named after the audio hash and the version of the model or
+    prompt that produced them. The total size is capped at `max_bytes`; the
+    least recently used entries (by file mtime, refreshed on every hit) are
+    evicted first.
+
+    Several processes (e.g. gunicorn workers) may share one root: entries
+    are written to unique temporary files and renamed into place, and the
+    total size is read from disk whenever entries are written. A failed
+    read counts as a miss and a failed write is skipped; both are logged,
+    since a cache error must not fail the analysis.
+    """
+
+    def __init__(self, root: Union[str, Path], max_bytes: int = 512 * 1024 * 1024):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+        self._errors = 0
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def _path(self, layer: str, audio_hash: str, version: str) -> Path:
+        version_tag = hashlib.sha256(version.encode()).hexdigest()[:16]
+        return self.root / layer / f"{audio_hash}-{version_tag}.json"
+
+    def get(self, layer: str, audio_hash: str, version: str) -> Optional[dict]:
+        path = self._path(layer, audio_hash, version)
+        try:
+            value = json.loads(path.read_text())
+        except FileNotFoundError:
+            value = None
+        except (OSError, ValueError) as e:
+            logger.warning("Reading cache entry %s failed: %s", path, e)
+            value = None
+            with self._lock:
+                self._errors += 1
+        with self._lock:
+            if value is None:
+                self._misses[layer] = self._misses.get(layer, 0) + 1
+                return None
+            self._hits[layer] = self._hits.get(layer, 0) + 1
+        try:
+            os.utime(path)
+        except OSError:
+            # Evicted by another process in the meantime
+            pass
+        return value
+
+    def put(self, layer: str, audio_hash: str, version: str, value: dict) -> None:
+        path = self._path(layer, audio_hash, version)
+        data = json.dumps(value).encode()
+        try:
+            path.parent.mkdir(exist_ok=True)
+            # A temp file of its own, renamed into place, so readers never see
+            # a partial entry and concurrent writers of one entry don't collide
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f"{path.stem}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+            with self._lock:
+                self._evict()
+        except OSError as e:
+            logger.warning("Writing cache entry %s failed: %s", path, e)
+            with self._lock:
+                self._errors += 1
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        """(mtime, size, path) of every entry on disk, oldest first"""
+        entries = []
+        for path in self.root.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Evicted or replaced by another process while listing
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def _evict(self) -> None:
+        # Other processes write to the same root, so the total is taken from
+        # disk rather than from this process's own writes
+        entries = self._entries()
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            self._total_bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            layers = set(self._hits) | set(self._misses)
+            return {
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "errors": self._errors,
+                "layers": {
+                    layer: {
+                        "hits": self._hits.get(layer, 0),
+                        "misses": self._misses.get(layer, 0),
+                    }
+                    for layer in sorted(layers)
+                },
+            }
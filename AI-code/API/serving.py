@@ -0,0 +1,117 @@
+"""Process helpers for the pre-forking gunicorn setup in gunicorn.conf.py.
+
+Example:
+    gunicorn -c gunicorn.conf.py app:app
+    python serving.py $(pgrep -o -f "gunicorn -c gunicorn.conf.py")
+
+The second command prints the memory of the gunicorn master and each of its
+workers. RSS counts shared pages in every process that maps them; PSS splits
+them between those processes, so the PSS total is what the workers really
+cost together.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+# Thread pools sized from these variables when their library is loaded
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def threads_per_worker(workers: int, cpus: Optional[int] = None) -> int:
+    """Intra-op threads per worker so that all workers together use each core once"""
+    cpus = cpus or len(os.sched_getaffinity(0))
+    return max(1, cpus // max(1, workers))
+
+
+def pin_threads(threads: int) -> None:
+    """Size the math thread pools of this process.
+
+    The environment covers libraries that are not loaded yet; torch, if
+    already imported, is resized directly.
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def process_start_time(pid: int) -> Optional[int]:
+    """When a process started, in clock ticks since boot; None without procfs or if it is gone"""
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return None
+    # Fields after the command name, which may itself contain spaces and ")"
+    return int(stat[stat.rindex(")") + 2:].split()[19])
+
+
+def process_alive(pid: int, started: Optional[int] = None) -> bool:
+    """Whether a process with this PID exists, e.g. a worker that left state in a shared file.
+
+    With `started` (from `process_start_time`), a process that reused the
+    PID after a restart does not count.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    if started is not None:
+        current = process_start_time(pid)
+        return current is None or current == started
+    return True
+
+
+def freeze_heap() -> None:
+    """Move every object allocated so far out of the garbage collector's reach.
+
+    A collection writes to the header of every object it scans. In the
+    master right before forking, that would turn pages shared with the
+    workers into private copies, one per worker.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def memory(pid: int) -> dict:
+    """RSS, PSS, shared and private bytes of a process, from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        name, value = line.split(":", 1)
+        fields[name] = int(value.split()[0]) * 1024
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def children(pid: int) -> List[int]:
+    pids = []
+    for task in Path(f"/proc/{pid}/task").iterdir():
+        pids.extend(int(child) for child in (task / "children").read_text().split())
+    return sorted(pids)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Memory of a gunicorn master and its workers")
+    parser.add_argument("pid", type=int, help="PID of the gunicorn master")
+    args = parser.parse_args(argv)
+
+    processes = {"master": memory(args.pid)}
+    for pid in children(args.pid):
+        processes[f"worker-{pid}"] = memory(pid)
+    total = {key: sum(process[key] for process in processes.values()) for key in ("rss", "pss")}
+    print(json.dumps({"processes": processes, "workers": len(processes) - 1, "total": total}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,92 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple, Union
 from datetime import datetime
+from contextlib import contextmanager
+from concurrent.futures import Executor
+import asyncio
+import subprocess
+import time
+from functools import lru_cache
+import numpy as np
 import soundfile as sf
-import whisper
-import torch
-from pathlib import Path
+import tiktoken
 from pydub import AudioSegment
 import re
-import openai
+from model_registry import whisper_registry
+from openai_client import openai_client
+from result_cache import ResultCache, hash_file
+from vad import TimestampMap, trim_silence
+from long_audio import long_audio_transcriber
+from diarization import estimate_speakers
+from keyphrases import topic_index
+from tiering import MODELS, model_selector
+
+
+# Whisper expects 16 kHz mono float32 input
+SAMPLE_RATE = 16000
+
+# Pipeline stages reported through the `progress` callback of `analyze_audio`
+STAGES = ("convert", "duration", "vad", "transcribe", "summarize", "topics", "speakers")
+
+SUMMARY_MODEL = "gpt-4"  # Use "gpt-4" or "gpt-3.5-turbo"
+SUMMARY_SYSTEM_PROMPT = "You are a helpful assistant specialized in summarizing text."
+SUMMARY_STRUCTURE = (
+    "The summary should be structured as follows:\n"
+    "1. **Key Points**: List around 1-10 important points (if any) talked about in the transcript. If the transcript is small, you can list fewer important points.\n"
+    "2. **Key Questions Asked**: List the main questions asked during the interview.\n"
+    "3. **Candidate's Responses**: Summarize the main points of the candidate's answers to the all the questions that were asked.\n"
+    "4. **Key Strengths or Skills Identified**: Highlight any specific strengths or skills the candidate mentioned.\n"
+    "5. **Follow-Up Topics**: List any unresolved points or topics that might need further discussion.\n\n"
+)
+SUMMARY_PROMPT = (
+    "You are a highly skilled assistant helping to summarize interview transcripts. "
+    + SUMMARY_STRUCTURE
+    + "Here is the transcript of the interview:\n"
+    "{text}\n\n"
+    "Please follow the structure and keep the summary clear and professional."
+)
+
+# Transcripts that don't fit the model's context window are summarized in
+# parts concurrently, then the notes are merged into the structure above
+MODEL_CONTEXT_TOKENS = {"gpt-4": 8192, "gpt-3.5-turbo": 4096}
+SUMMARY_MAX_TOKENS = 1000
+CHUNK_TOKENS = 2500
+CHUNK_NOTES_MAX_TOKENS = 400
+CHUNK_PROMPT = (
+    "You are reading part {index} of {count} of an interview transcript. "
+    "Write concise notes on the important points, the questions asked, the candidate's answers, "
+    "any strengths or skills mentioned and any unresolved topics. Keep names, numbers and technical terms.\n\n"
+    "Transcript part:\n"
+    "{text}"
+)
+MERGE_PROMPT = (
+    "You are a highly skilled assistant helping to summarize interview transcripts. "
+    "The interview was too long to read at once, so notes were taken on each part in order. "
+    "Combine them into one summary of the whole interview. "
+    + SUMMARY_STRUCTURE
+    + "Here are the notes for each part of the interview:\n"
+    "{text}\n\n"
+    "Please follow the structure and keep the summary clear and professional."
+)
+
+# Cache versions; change them whenever the model or prompt changes so stale
+# results are not served from the result cache
+TRANSCRIPT_VERSION = "whisper-tiered-vad-v3"
+DIARIZATION_VERSION = "mfcc-kmeans-v1"
+TOPICS_VERSION = "tfidf-v1"
+SUMMARY_VERSION = "/".join(
+    [
+        TRANSCRIPT_VERSION,
+        SUMMARY_MODEL,
+        SUMMARY_SYSTEM_PROMPT,
+        SUMMARY_PROMPT,
+        CHUNK_PROMPT,
+        MERGE_PROMPT,
+        str(CHUNK_TOKENS),
+        DIARIZATION_VERSION,
+        TOPICS_VERSION,
+    ]
+)
 
 
 class Summary(BaseModel):
@@ -19,13 +98,99 @@ class Summary(BaseModel):
     transcript: str
     confidence_score: float
     speaker_count: Optional[int]
+    # Timed transcript segments, in seconds of the original recording
+    segments: Optional[List[dict]] = None
+    # Seconds of silence skipped by voice activity detection
+    silence_removed: Optional[float] = None
+    # Who spoke when: speaker index with start/end in seconds of the recording
+    speaker_turns: Optional[List[dict]] = None
+    # SHA-256 of the uploaded file, the key of its cache entries and history record
+    audio_hash: Optional[str] = None
+    # Whisper size that transcribed the recording, why it was picked
+    # ("quality", "budget" or "over_budget", or "cached" when the transcript
+    # was reused) and the predicted and actual transcription time in seconds
+    # of this request, 0 for a reused transcript
+    whisper_model: Optional[str] = None
+    whisper_model_reason: Optional[str] = None
+    predicted_transcribe_seconds: Optional[float] = None
+    transcribe_seconds: Optional[float] = None
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """Local tokenizer matching the summary model, for token budgeting"""
+    try:
+        return tiktoken.encoding_for_model(SUMMARY_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
 
 
 class AudioProcessor:
     @staticmethod
     def get_audio_duration(file_path: str) -> float:
-        data, samplerate = sf.read(file_path)
-        return len(data) / samplerate
+        """Duration from the container header, or from decoding when the header has none"""
+        try:
+            return sf.info(file_path).duration
+        except Exception:
+            pass
+        # Formats libsndfile can't parse (webm, mp3 on older builds) go through ffprobe
+        try:
+            out = subprocess.run(
+                [
+                    "ffprobe", "-v", "error", "-show_entries", "format=duration",
+                    "-of", "default=noprint_wrappers=1:nokey=1", file_path,
+                ],
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+            return float(out.strip())
+        except Exception:
+            pass
+        # Streamed recordings, e.g. MediaRecorder WebM, have no duration in
+        # the header ("N/A"); count the decoded time instead. Nothing is kept
+        # in memory, and files that fail to decode are refused here
+        return AudioProcessor.decoded_duration(file_path)
+
+    @staticmethod
+    def decoded_duration(file_path: str) -> float:
+        try:
+            log = subprocess.run(
+                ["ffmpeg", "-nostdin", "-hide_banner", "-i", file_path, "-vn", "-f", "null", "-"],
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stderr
+        except subprocess.CalledProcessError as e:
+            raise ValueError(f"Could not read audio duration: {e.stderr.strip()[-500:]}")
+        except Exception as e:
+            raise ValueError(f"Could not read audio duration: {str(e)}")
+        times = re.findall(r"time=(\d+):(\d+):(\d+(?:\.\d+)?)", log)
+        if not times:
+            raise ValueError("Could not read audio duration: no audio decoded")
+        hours, minutes, seconds = times[-1]
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    @staticmethod
+    def decode_audio(file_path: str) -> np.ndarray:
+        """Decode any ffmpeg-readable file once into a 16 kHz mono float32 buffer"""
+        try:
+            out = subprocess.run(
+                [
+                    "ffmpeg", "-nostdin", "-threads", "0", "-i", file_path,
+                    "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le",
+                    "-ar", str(SAMPLE_RATE), "-",
+                ],
+                capture_output=True,
+                check=True,
+            ).stdout
+        except subprocess.CalledProcessError as e:
+            raise ValueError(f"Audio decoding failed: {e.stderr.decode(errors='ignore')}")
+        except Exception as e:
+            raise ValueError(f"Audio decoding failed: {str(e)}")
+        audio = np.frombuffer(out, np.int16).astype(np.float32)
+        audio *= 1.0 / 32768.0
+        return audio
 
     @staticmethod
     def convert_to_wav(input_path: str, output_path: str) -> None:
@@ -36,13 +201,41 @@ class AudioProcessor:
             raise ValueError(f"Audio conversion failed: {str(e)}")
 
     @staticmethod
-    def transcribe_audio(file_path: str) -> tuple[str, float]:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        model = whisper.load_model("base").to(device)
-        result = model.transcribe(file_path)
-        transcript = result["text"]
-        confidence = result.get("confidence", 0.0)
-        return transcript, confidence
+    def transcribe_segments(audio: Union[str, np.ndarray], model_name: str = "base") -> dict:
+        """Transcript, confidence and timed segments of a file path or 16 kHz float32 buffer"""
+        # Long buffers are split at pauses and transcribed in parallel
+        if isinstance(audio, np.ndarray) and long_audio_transcriber.should_chunk(len(audio) / SAMPLE_RATE):
+            return long_audio_transcriber.transcribe(audio, SAMPLE_RATE, model_name)
+        with whisper_registry.acquire(model_name) as model:
+            result = model.transcribe(audio)
+        return {
+            # The model's own time, without loading it or waiting for it
+            "inference_seconds": model.inference_seconds,
+            "text": result["text"],
+            "confidence": result.get("confidence", 0.0),
+            "segments": [
+                {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+                for segment in result.get("segments", [])
+            ],
+        }
+
+    @staticmethod
+    def transcribe_audio(
+        audio: Union[str, np.ndarray], model_name: str = "base"
+    ) -> tuple[str, float]:
+        """Transcribe a file path or an already decoded 16 kHz float32 buffer"""
+        result = AudioProcessor.transcribe_segments(audio, model_name)
+        return result["text"], result["confidence"]
+
+    @staticmethod
+    def estimate_speakers(audio: np.ndarray) -> dict:
+        """Speaker count and turns from MFCC embeddings of a 16 kHz float32 buffer"""
+        return estimate_speakers(audio, SAMPLE_RATE)
+
+    @staticmethod
+    def warm_up(model_name: str = "base") -> None:
+        """Load a Whisper model and run it once on a second of silence"""
+        AudioProcessor.transcribe_audio(np.zeros(SAMPLE_RATE, dtype=np.float32), model_name)
 
 
 class TextAnalyzer:
@@ -63,80 +256,325 @@ class TextAnalyzer:
 
         return qa_pairs
 
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        return len(_encoding().encode(text))
+
+    @staticmethod
+    def split_by_tokens(text: str, max_tokens: int) -> List[str]:
+        """Split text on sentence boundaries into pieces of at most `max_tokens` tokens"""
+        encoding = _encoding()
+        chunks, current, current_tokens = [], [], 0
+        for sentence in re.split(r"(?<=[.!?])\s+", text.strip()):
+            tokens = encoding.encode(sentence)
+            # A single sentence longer than the budget is cut by tokens
+            pieces = [sentence]
+            if len(tokens) > max_tokens:
+                pieces = [
+                    encoding.decode(tokens[start:start + max_tokens])
+                    for start in range(0, len(tokens), max_tokens)
+                ]
+            for piece in pieces:
+                n_tokens = len(encoding.encode(piece)) if len(pieces) > 1 else len(tokens)
+                if current and current_tokens + n_tokens > max_tokens:
+                    chunks.append(" ".join(current))
+                    current, current_tokens = [], 0
+                current.append(piece)
+                current_tokens += n_tokens
+        if current:
+            chunks.append(" ".join(current))
+        return chunks
+
+    @staticmethod
+    async def _complete(prompt: str, max_tokens: int) -> str:
+        response = await openai_client.chat_completion(
+            model=SUMMARY_MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": SUMMARY_SYSTEM_PROMPT,
+                },
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.5,
+            max_tokens=max_tokens,
+        )
+        return response["choices"][0]["message"]["content"].strip()
+
+    @staticmethod
+    async def generate_summary_async(text: str) -> str:
+        """Summarize in one call if the prompt fits, otherwise map-reduce over token-budgeted chunks"""
+        context = MODEL_CONTEXT_TOKENS.get(SUMMARY_MODEL, 4096)
+        budget = context - SUMMARY_MAX_TOKENS - TextAnalyzer.count_tokens(SUMMARY_SYSTEM_PROMPT) - 32
+        prompt = SUMMARY_PROMPT.format(text=text)
+        if TextAnalyzer.count_tokens(prompt) <= budget:
+            return await TextAnalyzer._complete(prompt, SUMMARY_MAX_TOKENS)
+
+        # All chunks of one level are sent at once, so the latency of a level
+        # is that of its slowest chunk; levels repeat until the notes fit
+        chunks = TextAnalyzer.split_by_tokens(text, CHUNK_TOKENS)
+        while True:
+            notes = await asyncio.gather(
+                *(
+                    TextAnalyzer._complete(
+                        CHUNK_PROMPT.format(index=index, count=len(chunks), text=chunk),
+                        CHUNK_NOTES_MAX_TOKENS,
+                    )
+                    for index, chunk in enumerate(chunks, start=1)
+                )
+            )
+            merged = "\n\n".join(
+                f"Part {index}:\n{note}" for index, note in enumerate(notes, start=1)
+            )
+            prompt = MERGE_PROMPT.format(text=merged)
+            if TextAnalyzer.count_tokens(prompt) <= budget:
+                return await TextAnalyzer._complete(prompt, SUMMARY_MAX_TOKENS)
+            chunks = TextAnalyzer.split_by_tokens(merged, CHUNK_TOKENS)
+
     @staticmethod
     def generate_summary(text: str) -> str:
         """
         Generate a concise summary using OpenAI ChatGPT.
         """
         try:
-            prompt = (
-                "You are a highly skilled assistant helping to summarize interview transcripts. "
-                "The summary should be structured as follows:\n"
-                "1. **Key Points**: List around 1-10 important points (if any) talked about in the transcript. If the transcript is small, you can list fewer important points.\n"
-                "2. **Key Questions Asked**: List the main questions asked during the interview.\n"
-                "3. **Candidate's Responses**: Summarize the main points of the candidate's answers to the all the questions that were asked.\n"
-                "4. **Key Strengths or Skills Identified**: Highlight any specific strengths or skills the candidate mentioned.\n"
-                "5. **Follow-Up Topics**: List any unresolved points or topics that might need further discussion.\n\n"
-                "Here is the transcript of the interview:\n"
-                f"{text}\n\n"
-                "Please follow the structure and keep the summary clear and professional."
-            )
-            response = openai.ChatCompletion.create(
-                model="gpt-4",  # Use "gpt-4" or "gpt-3.5-turbo"
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant specialized in summarizing text.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.5,
-                max_tokens=1000,  # Adjust based on the summary length
-            )
-            return response["choices"][0]["message"]["content"].strip()
+            return openai_client.run_sync(TextAnalyzer.generate_summary_async(text))
         except Exception as e:
             raise RuntimeError(f"Error generating summary: {str(e)}")
 
     @staticmethod
-    def extract_topics(text: str) -> List[str]:
-        return ["Topic extraction is yet to be implemented"]
+    def extract_key_points(chatgpt_summary: str) -> List[str]:
+        """Parse the bullet points of the "Key Points" section of a GPT summary"""
+        key_points = []
+        if chatgpt_summary:
+            key_points_section = re.search(
+                r"1\.\s*\*\*Key Points\*\*:(.*?)\n", chatgpt_summary, re.DOTALL
+            )
+            if key_points_section:
+                key_points_text = key_points_section.group(1).strip()
+                key_points = [
+                    point.strip() for point in key_points_text.split("\n") if point.strip()
+                ]
+        return key_points
 
     @staticmethod
-    def estimate_speaker_count(text: str) -> int:
-        return 1
+    def extract_topics(text: str) -> List[str]:
+        """Key phrases ranked by TF-IDF against the interview corpus index"""
+        return topic_index.top_phrases(text)
+
+
+class AudioAnalysis:
+    """State of one recording as it moves through the pipeline stages.
 
+    The steps are separate methods so `analyze_audio` can run them in
+    sequence while `pipeline.StagedPipeline` runs each one on its own
+    workers. `progress(stage, state)` is called as each stage starts and
+    ends. With a `cache`, transcripts and summaries are looked up by the
+    SHA-256 of the audio bytes and stages whose results are cached report
+    "cached". The Whisper size is picked by `tiering.model_selector` from the
+    `quality` tier and what is left of `latency_budget` (seconds from the
+    moment the analysis was created) when transcription starts.
+    """
 
-def analyze_audio(file_path: str) -> Summary:
-    file_ext = Path(file_path).suffix.lower()
-    wav_path = file_path
-    if file_ext != ".wav":
-        wav_path = str(Path(file_path).with_suffix(".wav"))
-        AudioProcessor.convert_to_wav(file_path, wav_path)
+    def __init__(
+        self,
+        file_path: str,
+        progress: Optional[Callable[[str, str], None]] = None,
+        cache: Optional[ResultCache] = None,
+        latency_budget: Optional[float] = None,
+        quality: Optional[str] = None,
+    ):
+        self.file_path = file_path
+        self.progress = progress
+        self.cache = cache
+        self.latency_budget = latency_budget
+        self.quality = quality
+        self.created_at = time.monotonic()
+        self.audio_hash: Optional[str] = None
+        self.audio: Optional[np.ndarray] = None
+        self.duration: Optional[float] = None
+        self.timeline: Optional[TimestampMap] = None
+        self.transcription: Optional[dict] = None
+        self.analysis: Optional[dict] = None
+        self.analysis_cached = False
+        self.transcript_cached = False
 
-    duration = AudioProcessor.get_audio_duration(wav_path)
-    transcript, confidence = AudioProcessor.transcribe_audio(wav_path)
-    chatgpt_summary = TextAnalyzer.generate_summary(transcript)
-    topics = TextAnalyzer.extract_topics(transcript)
-    speaker_count = TextAnalyzer.estimate_speaker_count(transcript)
+    def report(self, stage: str, state: str) -> None:
+        if self.progress is not None:
+            self.progress(stage, state)
 
-    key_points = []
-    if chatgpt_summary:
-        key_points_section = re.search(
-            r"1\.\s*\*\*Key Points\*\*:(.*?)\n", chatgpt_summary, re.DOTALL
+    @contextmanager
+    def stage(self, name: str):
+        self.report(name, "running")
+        yield
+        self.report(name, "done")
+
+    def decode(self) -> None:
+        """Look up cached results, then decode the upload unless its transcript is cached"""
+        self.audio_hash = hash_file(self.file_path)
+        if self.cache is not None:
+            self.transcription = self.cache.get("transcript", self.audio_hash, TRANSCRIPT_VERSION)
+            self.analysis = self.cache.get("summary", self.audio_hash, SUMMARY_VERSION)
+            # A transcript by a smaller model than the quality tier allows is
+            # redone, and so is everything derived from it
+            best = MODELS.index(model_selector.candidates(self.quality)[0])
+            if self.transcription is not None and MODELS.index(self.transcription["model"]) < best:
+                self.transcription = self.analysis = None
+            self.analysis_cached = self.analysis is not None
+            self.transcript_cached = self.transcription is not None
+        if self.transcription is not None:
+            for name in ("convert", "duration", "vad", "transcribe"):
+                self.report(name, "cached")
+            return
+
+        # Decode once in memory; the buffer feeds Whisper directly and gives
+        # the duration, so no intermediate WAV file is written or re-read
+        with self.stage("convert"):
+            self.audio = AudioProcessor.decode_audio(self.file_path)
+        with self.stage("duration"):
+            self.duration = len(self.audio) / SAMPLE_RATE
+        # Whisper only sees the speech; the timeline maps its times back
+        with self.stage("vad"):
+            self.audio, self.timeline = trim_silence(self.audio, SAMPLE_RATE)
+
+    def transcribe(self) -> None:
+        if self.transcription is not None:
+            return
+        remaining = None
+        if self.latency_budget is not None:
+            remaining = self.latency_budget - (time.monotonic() - self.created_at)
+        choice = model_selector.choose(len(self.audio) / SAMPLE_RATE, remaining, self.quality)
+        inference_seconds = None
+        try:
+            with self.stage("transcribe"):
+                start = time.perf_counter()
+                if len(self.audio):
+                    result = AudioProcessor.transcribe_segments(self.audio, choice.model)
+                else:
+                    result = {"text": "", "confidence": 0.0, "segments": []}
+                elapsed = time.perf_counter() - start
+            # Only inference feeds the real-time factor: the selector adds
+            # load time and queued work to its predictions separately
+            inference_seconds = result.get("inference_seconds", elapsed)
+        finally:
+            model_selector.finish(choice, inference_seconds)
+        if result["segments"]:
+            starts = self.timeline.to_original([segment["start"] for segment in result["segments"]])
+            ends = self.timeline.to_original(
+                [segment["end"] for segment in result["segments"]], side="left"
+            )
+            for segment, start, end in zip(result["segments"], starts, ends):
+                segment["start"], segment["end"] = round(float(start), 2), round(float(end), 2)
+        self.transcription = {
+            "transcript": result["text"],
+            "confidence": result["confidence"],
+            "duration": self.duration,
+            "segments": result["segments"],
+            "silence_removed": self.timeline.removed_duration,
+            "model": choice.model,
+            "model_reason": choice.reason,
+            "predicted_seconds": round(choice.predicted_seconds, 2),
+            "transcribe_seconds": round(elapsed, 2),
+        }
+        if self.cache is not None:
+            self.cache.put("transcript", self.audio_hash, TRANSCRIPT_VERSION, self.transcription)
+
+    def speech(self) -> Tuple[np.ndarray, TimestampMap]:
+        """The speech-only buffer, decoded again if the transcript came from the cache"""
+        if self.audio is None:
+            self.audio, self.timeline = trim_silence(
+                AudioProcessor.decode_audio(self.file_path), SAMPLE_RATE
+            )
+        return self.audio, self.timeline
+
+    def summarize(self) -> None:
+        if self.analysis_cached:
+            self.report("summarize", "cached")
+            return
+        with self.stage("summarize"):
+            chatgpt_summary = TextAnalyzer.generate_summary(self.transcription["transcript"])
+        self.analysis = {
+            "summary": chatgpt_summary,
+            "key_points": TextAnalyzer.extract_key_points(chatgpt_summary),
+        }
+
+    def analyze(self, executor: Optional[Executor] = None) -> None:
+        """Run the independent analyzers, concurrently when an executor is given"""
+        if self.analysis_cached:
+            for name in ("topics", "speakers"):
+                self.report(name, "cached")
+            return
+
+        def topics():
+            with self.stage("topics"):
+                topics = TextAnalyzer.extract_topics(self.transcription["transcript"])
+            # Every new interview feeds the IDF statistics for the next ones
+            topic_index.add_documents([self.transcription["transcript"]])
+            return topics
+
+        def speakers():
+            with self.stage("speakers"):
+                audio, timeline = self.speech()
+                result = AudioProcessor.estimate_speakers(audio)
+            # The buffer is not needed after diarization
+            self.audio = None
+            if result["turns"]:
+                starts = timeline.to_original([turn["start"] for turn in result["turns"]])
+                ends = timeline.to_original([turn["end"] for turn in result["turns"]], side="left")
+                for turn, start, end in zip(result["turns"], starts, ends):
+                    turn["start"], turn["end"] = round(float(start), 2), round(float(end), 2)
+            return result
+
+        if executor is not None:
+            topics_future, speakers_future = executor.submit(topics), executor.submit(speakers)
+            self.analysis["topics"] = topics_future.result()
+            diarization = speakers_future.result()
+        else:
+            self.analysis["topics"] = topics()
+            diarization = speakers()
+        self.analysis["speaker_count"] = diarization["speaker_count"]
+        self.analysis["speaker_turns"] = diarization["turns"]
+        if self.cache is not None:
+            self.cache.put("summary", self.audio_hash, SUMMARY_VERSION, self.analysis)
+
+    def result(self) -> Summary:
+        if self.transcript_cached:
+            # This request spent no time on transcription
+            model_reason, predicted_seconds, transcribe_seconds = "cached", 0.0, 0.0
+        else:
+            model_reason = self.transcription["model_reason"]
+            predicted_seconds = self.transcription["predicted_seconds"]
+            transcribe_seconds = self.transcription["transcribe_seconds"]
+        return Summary(
+            key_points=self.analysis["key_points"],
+            summary=self.analysis["summary"],
+            topics_discussed=self.analysis["topics"],
+            duration=self.transcription["duration"],
+            interview_date=datetime.now(),
+            transcript=self.transcription["transcript"],
+            confidence_score=self.transcription["confidence"],
+            speaker_count=self.analysis["speaker_count"],
+            speaker_turns=self.analysis["speaker_turns"],
+            segments=self.transcription["segments"],
+            silence_removed=self.transcription["silence_removed"],
+            audio_hash=self.audio_hash,
+            whisper_model=self.transcription["model"],
+            whisper_model_reason=model_reason,
+            predicted_transcribe_seconds=predicted_seconds,
+            transcribe_seconds=transcribe_seconds,
         )
-        if key_points_section:
-            key_points_text = key_points_section.group(1).strip()
-            key_points = [
-                point.strip() for point in key_points_text.split("\n") if point.strip()
-            ]
-
-    return Summary(
-        key_points=key_points,
-        summary=chatgpt_summary,
-        topics_discussed=topics,
-        duration=duration,
-        interview_date=datetime.now(),
-        transcript=transcript,
-        confidence_score=confidence,
-        speaker_count=speaker_count,
-    )
+
+
+def analyze_audio(
+    file_path: str,
+    progress: Optional[Callable[[str, str], None]] = None,
+    cache: Optional[ResultCache] = None,
+    latency_budget: Optional[float] = None,
+    quality: Optional[str] = None,
+) -> Summary:
+    """Run the full pipeline for one file, stage after stage"""
+    analysis = AudioAnalysis(file_path, progress, cache, latency_budget, quality)
+    analysis.decode()
+    analysis.transcribe()
+    analysis.summarize()
+    analysis.analyze()
+    return analysis.result()
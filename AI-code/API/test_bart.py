@@ -1,21 +1,55 @@
-from transformers import BartForConditionalGeneration, BartTokenizer
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
+import os
+import numpy as np
 import soundfile as sf
-import whisper
-import torch
 from pathlib import Path
 from pydub import AudioSegment
+import re
+from model_registry import LazyModel, whisper_registry
+from diarization import estimate_speakers
+from keyphrases import topic_index
+from batching import MicroBatcher
+import metrics
+from inference_backends import load_bart
+
+# Inference backends ("fp32", "int8" or "onnx"); the quantized and ONNX ones run on CPU
+bart_backend = os.environ.get("BART_BACKEND", "fp32")
+whisper_backend = os.environ.get("WHISPER_BACKEND", "fp32")
+# The device is picked by the registry on first use, so importing this module
+# does not import torch
+whisper_registry.configure(backend=whisper_backend)
+
+# IDF index over past interviews, built with `python keyphrases.py build`
+topic_index.configure(os.environ.get("TOPIC_INDEX"))
 
-# Check if GPU is available
-device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"Using device: {device}")
-
-# Load BART tokenizer and model
 bart_model_name = "facebook/bart-large-cnn"
-bart_tokenizer = BartTokenizer.from_pretrained(bart_model_name)
-bart_model = BartForConditionalGeneration.from_pretrained(bart_model_name).to(device)
+
+
+# Function to load the BART tokenizer and model on the Whisper device
+def load_bart_pair():
+    from transformers import BartTokenizer
+
+    print(f"Using device: {whisper_registry.device}")
+    tokenizer = BartTokenizer.from_pretrained(bart_model_name)
+    return tokenizer, load_bart(bart_model_name, whisper_registry.device, bart_backend)
+
+
+# BART is loaded on first use (or by `warm_up`) instead of at import time
+bart = LazyModel(load_bart_pair)
+
+# BART's encoder only sees 1024 positions; longer transcripts are summarized in chunks
+BART_MAX_INPUT_TOKENS = 1024
+CHUNK_MAX_TOKENS = 900  # Leaves room for special tokens and the overlap
+CHUNK_OVERLAP_TOKENS = 64
+CHUNK_BATCH_SIZE = 8
+CHUNK_SUMMARY_MAX_LENGTH = 200
+CHUNK_SUMMARY_MIN_LENGTH = 40
+
+# Final summaries from concurrent requests are gathered into one generate call
+SUMMARY_MAX_BATCH_SIZE = 8
+SUMMARY_BATCH_WAIT = 0.05  # Seconds to wait for more requests before generating
 
 
 class Summary(BaseModel):
@@ -52,39 +86,135 @@ class AudioProcessor:
     # Function to convert audio file to text
     @staticmethod
     def transcribe_audio(file_path: str) -> tuple[str, float]:
-        # Load Whisper model to GPU if available
-        model = whisper.load_model("base").to(device)
-        result = model.transcribe(file_path)
+        # Reuse the process-wide Whisper model instead of loading it per call
+        with whisper_registry.acquire("base") as model:
+            result = model.transcribe(file_path)
         transcript = result["text"]
         confidence = result.get("confidence", 0.0)
         return transcript, confidence
 
+    # Function to estimate the speaker count from the voices in the recording
+    @staticmethod
+    def estimate_speaker_count(wav_path: str) -> int:
+        data, samplerate = sf.read(wav_path, dtype="float32")
+        if data.ndim > 1:
+            data = data.mean(axis=1)
+        return estimate_speakers(data, samplerate)["speaker_count"]
+
 
 class TextAnalyzer:
     """Class to handle text analysis"""
 
+    # Function to split a transcript into overlapping token windows on sentence boundaries
+    @staticmethod
+    def chunk_transcript(
+        text: str,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    ) -> List[str]:
+        sentences = [s for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s]
+        if not sentences:
+            return []
+        bart_tokenizer, _ = bart.get()
+        # Tokenize every sentence in one call instead of once per chunk
+        sentence_ids = bart_tokenizer(sentences, add_special_tokens=False).input_ids
+
+        # Sentences longer than a whole window are cut into window-sized pieces
+        pieces = []
+        for sentence, ids in zip(sentences, sentence_ids):
+            if len(ids) <= max_tokens:
+                pieces.append((sentence, len(ids)))
+                continue
+            for start in range(0, len(ids), max_tokens):
+                part = ids[start:start + max_tokens]
+                pieces.append((bart_tokenizer.decode(part), len(part)))
+
+        chunks = []
+        current, current_tokens = [], 0
+        for piece, n_tokens in pieces:
+            if current and current_tokens + n_tokens > max_tokens:
+                chunks.append(" ".join(p for p, _ in current))
+                # Carry the trailing sentences into the next window as overlap
+                overlap, overlap_count = [], 0
+                for prev in reversed(current):
+                    if overlap_count + prev[1] > min(overlap_tokens, max_tokens - n_tokens):
+                        break
+                    overlap.insert(0, prev)
+                    overlap_count += prev[1]
+                current, current_tokens = overlap, overlap_count
+            current.append((piece, n_tokens))
+            current_tokens += n_tokens
+        chunks.append(" ".join(p for p, _ in current))
+        return chunks
+
+    # Function to summarize several texts with batched generate calls
+    @staticmethod
+    def summarize_batch(
+        texts: List[str],
+        max_length: int = CHUNK_SUMMARY_MAX_LENGTH,
+        min_length: int = CHUNK_SUMMARY_MIN_LENGTH,
+        batch_size: int = CHUNK_BATCH_SIZE,
+    ) -> List[str]:
+        import torch
+
+        bart_tokenizer, bart_model = bart.get()
+        summaries = []
+        for start in range(0, len(texts), batch_size):
+            inputs = bart_tokenizer(
+                texts[start:start + batch_size],
+                max_length=BART_MAX_INPUT_TOKENS,
+                padding=True,
+                truncation=True,
+                return_tensors="pt",
+            ).to(whisper_registry.device)
+            with torch.inference_mode():
+                summary_ids = bart_model.generate(
+                    inputs.input_ids,
+                    attention_mask=inputs.attention_mask,
+                    max_length=max_length,
+                    min_length=min_length,
+                    length_penalty=2.0,
+                    num_beams=4
+                )
+            summaries.extend(bart_tokenizer.batch_decode(summary_ids, skip_special_tokens=True))
+        return summaries
+
     # Function to generate summary
     @staticmethod
-    def generate_summary(text: str) -> str:
-        inputs = bart_tokenizer(text, max_length=1024, return_tensors="pt", truncation=True).to(device)
-        summary_ids = bart_model.generate(
-            inputs.input_ids,
-            max_length=1000,
-            min_length=350,
-            length_penalty=2.0,
-            num_beams=4
-        )
-        return bart_tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-
-    # Function to extract topics from the text
+    def generate_summary(text: str, chunked: bool = True) -> str:
+        # Map-reduce long transcripts: summarize every window in batches, then
+        # summarize the joined chunk summaries until they fit in one window
+        if chunked:
+            bart_tokenizer, _ = bart.get()
+            while len(bart_tokenizer(text).input_ids) > BART_MAX_INPUT_TOKENS:
+                chunks = TextAnalyzer.chunk_transcript(text)
+                text = " ".join(TextAnalyzer.summarize_batch(chunks))
+
+        return summary_batcher.submit(text)
+
+    # Function to rank the transcript's key phrases by TF-IDF against past interviews
     @staticmethod
     def extract_topics(text: str) -> List[str]:
-        return ["Topic extraction is yet to be implemented"]
+        return topic_index.top_phrases(text)
 
-    # Function to estimate the speaker count from the text
-    @staticmethod
-    def estimate_speaker_count(text: str) -> int:
-        return 1
+
+# Micro-batching scheduler in front of the final BART pass of generate_summary
+summary_batcher = MicroBatcher(
+    lambda texts: TextAnalyzer.summarize_batch(
+        texts, max_length=1000, min_length=350, batch_size=len(texts)
+    ),
+    max_batch_size=SUMMARY_MAX_BATCH_SIZE,
+    max_wait=SUMMARY_BATCH_WAIT,
+    name="bart-batcher",
+)
+metrics.register_batcher("summary", summary_batcher)
+
+
+# Function to load the models and run a dummy inference through each of them
+def warm_up() -> None:
+    with whisper_registry.acquire("base") as model:
+        model.transcribe(np.zeros(16000, dtype=np.float32))
+    TextAnalyzer.summarize_batch(["Warming up the summarizer."], max_length=8, min_length=1)
 
 
 # The main function to analyze the audio
@@ -99,7 +229,7 @@ def analyze_audio(file_path: str) -> Summary:
     transcript, confidence = AudioProcessor.transcribe_audio(wav_path)
     summary = TextAnalyzer.generate_summary(transcript)
     topics = TextAnalyzer.extract_topics(transcript)
-    speaker_count = TextAnalyzer.estimate_speaker_count(transcript)
+    speaker_count = AudioProcessor.estimate_speaker_count(wav_path)
 
     return Summary(
         key_points=[],
@@ -0,0 +1,161 @@
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from model_registry import whisper_registry
+
+# Whisper sizes from fastest to most accurate
+MODELS = ("tiny", "base", "small")
+# Quality tiers a request can ask for, and the most accurate model each allows
+QUALITY_TIERS = {"fast": "tiny", "balanced": "base", "accurate": "small"}
+DEFAULT_QUALITY = "balanced"
+# Starting guesses of the real-time factor (processing seconds per second of
+# speech), scaled by parameter count; the first measurement of a model
+# replaces its guess
+PRIOR_RTF = {"tiny": 0.05, "base": 0.1, "small": 0.33}
+# Guesses of the seconds to load a model that this process never loaded,
+# likewise scaled by parameter count; afterwards its last load time is used
+PRIOR_LOAD_SECONDS = {"tiny": 1.0, "base": 2.0, "small": 6.0}
+# Weight of the latest measurement in each model's moving average
+RTF_EWMA_ALPHA = 0.3
+
+
+class ModelChoice:
+    """The model picked for one transcription and the latency predicted for it"""
+
+    def __init__(
+        self, model: str, audio_seconds: float, wait_seconds: float, work_seconds: float, reason: str
+    ):
+        self.model = model
+        self.audio_seconds = audio_seconds
+        # Time until the transcriptions reserved before it are done, and its own
+        self.wait_seconds = wait_seconds
+        self.work_seconds = work_seconds
+        self.predicted_seconds = wait_seconds + work_seconds
+        self.reason = reason
+        self.started_at = time.monotonic()
+
+
+class ModelSelector:
+    """Picks the Whisper size for a transcription from a latency budget.
+
+    Each model's real-time factor is a moving average of its recent
+    transcriptions, so it reflects the load the node is under. A model's
+    predicted latency is its real-time factor times the seconds of speech,
+    plus the work already reserved on it (transcriptions on one model
+    instance run one at a time) and its load time if it is not loaded,
+    guessed from its size until it has been loaded once.
+    The most accurate model the quality tier allows whose prediction fits
+    the budget wins; if none fits, the fastest one does. Without a budget
+    the tier's model is used.
+    """
+
+    def __init__(self, models: Sequence[str] = MODELS, quality: str = DEFAULT_QUALITY):
+        self.models: List[str] = list(models)
+        self.quality = quality
+        self._rtf: Dict[str, float] = {}
+        self._measurements: Dict[str, int] = {}
+        self._reserved: Dict[str, List[ModelChoice]] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, models: Optional[str] = None, quality: Optional[str] = None) -> None:
+        """Restrict the models (comma-separated, fastest first) or change the default tier"""
+        if models:
+            names = [name.strip() for name in models.split(",")]
+            unknown = [name for name in names if name not in MODELS]
+            if unknown:
+                raise ValueError(f"Unknown Whisper models {unknown}, expected some of {MODELS}")
+            self.models = sorted(names, key=MODELS.index)
+        if quality is not None:
+            self.quality = quality
+
+    def candidates(self, quality: Optional[str] = None) -> List[str]:
+        """Models allowed by a quality tier, most accurate first"""
+        quality = quality or self.quality
+        if quality not in QUALITY_TIERS:
+            raise ValueError(f"Unknown quality tier '{quality}', expected one of {tuple(QUALITY_TIERS)}")
+        limit = MODELS.index(QUALITY_TIERS[quality])
+        allowed = [name for name in self.models if MODELS.index(name) <= limit]
+        return list(reversed(allowed)) or self.models[:1]
+
+    def _current_rtf(self, model: str) -> float:
+        return self._rtf.get(model, PRIOR_RTF[model])
+
+    def _predict(self, model: str, audio_seconds: float) -> Tuple[float, float]:
+        """Seconds spent waiting for `model` and seconds of its own work"""
+        now = time.monotonic()
+        with self._lock:
+            rtf = self._current_rtf(model)
+            reserved = self._reserved.get(model, [])
+            # Work reserved earlier finishes in order, starting with the oldest
+            wait = sum(choice.work_seconds for choice in reserved)
+            if reserved:
+                wait = max(0.0, wait - (now - reserved[0].started_at))
+        return wait, self._load_seconds(model) + rtf * audio_seconds
+
+    @staticmethod
+    def _load_seconds(model: str) -> float:
+        stats = whisper_registry.stats().get(model)
+        if stats is not None and stats["loaded"]:
+            return 0.0
+        if stats is not None and stats["last_load_seconds"]:
+            return stats["last_load_seconds"]
+        return PRIOR_LOAD_SECONDS[model]
+
+    def predict(self, model: str, audio_seconds: float) -> float:
+        """Seconds until a transcription of `audio_seconds` of speech on `model` would finish"""
+        return sum(self._predict(model, audio_seconds))
+
+    def choose(
+        self, audio_seconds: float, budget: Optional[float] = None, quality: Optional[str] = None
+    ) -> ModelChoice:
+        """Pick a model and reserve its predicted time; pass the choice to `finish` afterwards"""
+        candidates = self.candidates(quality)
+        predictions = [(model, *self._predict(model, audio_seconds)) for model in candidates]
+        if budget is None:
+            (model, wait, work), reason = predictions[0], "quality"
+        else:
+            fitting = [prediction for prediction in predictions if sum(prediction[1:]) <= budget]
+            if fitting:
+                (model, wait, work) = fitting[0]
+                reason = "quality" if model == candidates[0] else "budget"
+            else:
+                (model, wait, work) = min(predictions, key=lambda prediction: sum(prediction[1:]))
+                reason = "over_budget"
+        choice = ModelChoice(model, audio_seconds, wait, work, reason)
+        with self._lock:
+            self._reserved.setdefault(model, []).append(choice)
+        return choice
+
+    def finish(self, choice: ModelChoice, elapsed: Optional[float] = None) -> None:
+        """Release the reservation and fold the measured speed into the model's average.
+
+        `elapsed` is the model's inference time only; waiting for the model
+        and loading it are already part of the prediction.
+        """
+        with self._lock:
+            self._reserved[choice.model].remove(choice)
+            if elapsed is None or choice.audio_seconds <= 0:
+                return
+            rtf = elapsed / choice.audio_seconds
+            previous = self._rtf.get(choice.model)
+            if previous is not None:
+                rtf = previous + RTF_EWMA_ALPHA * (rtf - previous)
+            self._rtf[choice.model] = rtf
+            self._measurements[choice.model] = self._measurements.get(choice.model, 0) + 1
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                model: {
+                    "rtf": self._current_rtf(model),
+                    "measured": model in self._rtf,
+                    "measurements": self._measurements.get(model, 0),
+                    "in_flight": len(self._reserved.get(model, [])),
+                }
+                for model in self.models
+            }
+
+
+# Shared selector for the audio pipelines; restricted through `configure`
+model_selector = ModelSelector()
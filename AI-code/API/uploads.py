@@ -0,0 +1,61 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+CHUNK_SIZE = 1024 * 1024
+RAW_CONTENT_TYPE = "application/octet-stream"
+
+
+def _suffix(filename: Optional[str]) -> str:
+    # Only the extension of the client's name is kept, as a hint for ffmpeg
+    suffix = Path(filename or "").suffix.lower()
+    return suffix if suffix[1:].isalnum() and len(suffix) <= 8 else ""
+
+
+def save_stream(stream: BinaryIO, directory: Path, filename: Optional[str], max_bytes: Optional[int]) -> Path:
+    """Copy an upload in chunks to a new, uniquely named file in `directory`.
+
+    The file is removed again if the body grows past `max_bytes`, which also
+    covers chunked requests that don't announce a Content-Length.
+    """
+    fd, name = tempfile.mkstemp(prefix="upload-", suffix=_suffix(filename), dir=directory)
+    path = Path(name)
+    try:
+        written = 0
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_bytes is not None and written > max_bytes:
+                    raise RequestEntityTooLarge(f"Upload exceeds the limit of {max_bytes} bytes")
+                f.write(chunk)
+        if written == 0:
+            raise BadRequest("The uploaded audio is empty")
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path
+
+
+def save_upload(request, directory: Path, max_bytes: Optional[int] = None) -> Path:
+    """Store the audio of a request, sent either raw or as multipart `audio_file`.
+
+    Raw `application/octet-stream` bodies skip multipart parsing and are
+    streamed straight to disk; the original name may be given in the
+    `X-Filename` header.
+    """
+    if request.mimetype == RAW_CONTENT_TYPE:
+        return save_stream(request.stream, directory, request.headers.get("X-Filename"), max_bytes)
+    if "audio_file" not in request.files:
+        raise BadRequest("No audio files provided")
+    audio_file = request.files["audio_file"]
+    return save_stream(audio_file.stream, directory, audio_file.filename, max_bytes)
+
+
+def remove_upload(path: Path) -> None:
+    path.unlink(missing_ok=True)
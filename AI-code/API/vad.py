@@ -0,0 +1,128 @@
+from typing import Tuple
+
+import numpy as np
+
+# Energy VAD tuned for close-mic interview recordings at 16 kHz
+FRAME_SECONDS = 0.03
+# A frame is speech when it is this many dB above the recording's noise floor
+THRESHOLD_DB = 12.0
+# ... but at most this far below the loud frames, so recordings without pauses
+# (where the "noise floor" is speech) are kept whole
+MAX_BELOW_PEAK_DB = 25.0
+# ... and never below this absolute level (dBFS), so digital silence stays silent
+MIN_SPEECH_DBFS = -55.0
+NOISE_FLOOR_PERCENTILE = 10
+PEAK_PERCENTILE = 95
+# Context kept around every speech region so word onsets and tails survive
+PADDING_SECONDS = 0.2
+# Pauses shorter than this are kept; Whisper relies on them between sentences
+MIN_SILENCE_SECONDS = 0.6
+
+
+def frame_energy_db(audio: np.ndarray, frame_length: int) -> np.ndarray:
+    """RMS level of consecutive non-overlapping frames in dBFS"""
+    n_frames = len(audio) // frame_length
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[: n_frames * frame_length].reshape(n_frames, frame_length)
+    power = np.einsum("ij,ij->i", frames, frames) / frame_length
+    return 10 * np.log10(power + 1e-10)
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and end (exclusive) indices of the runs of True in a boolean array"""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def detect_speech(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Speech regions as an (n, 2) array of [start, end) sample offsets"""
+    frame_length = int(FRAME_SECONDS * sample_rate)
+    energy = frame_energy_db(audio, frame_length)
+    if len(energy) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    noise_floor, peak = np.percentile(energy, [NOISE_FLOOR_PERCENTILE, PEAK_PERCENTILE])
+    threshold = max(min(noise_floor + THRESHOLD_DB, peak - MAX_BELOW_PEAK_DB), MIN_SPEECH_DBFS)
+    speech = energy > threshold
+
+    # Close short pauses: silent runs shorter than MIN_SILENCE_SECONDS between
+    # two speech frames become speech
+    starts, ends = _runs(~speech)
+    fill = ((ends - starts) < int(MIN_SILENCE_SECONDS / FRAME_SECONDS)) & (starts > 0) & (ends < len(speech))
+    delta = np.zeros(len(speech) + 1, dtype=np.int32)
+    np.add.at(delta, starts[fill], 1)
+    np.add.at(delta, ends[fill], -1)
+    speech |= np.cumsum(delta[:-1]) > 0
+
+    starts, ends = _runs(speech)
+    padding = int(PADDING_SECONDS * sample_rate)
+    regions = np.stack((starts * frame_length - padding, ends * frame_length + padding), axis=1)
+    np.clip(regions, 0, len(audio), out=regions)
+    # Padding can make neighbouring regions overlap; merge them
+    if len(regions) > 1:
+        keep = np.concatenate(([True], regions[1:, 0] > regions[:-1, 1]))
+        merged_ends = np.maximum.reduceat(regions[:, 1], np.flatnonzero(keep))
+        regions = np.stack((regions[keep, 0], merged_ends), axis=1)
+    # The last partial frame belongs to the final region if that one reaches it
+    if len(regions) and regions[-1, 1] >= len(energy) * frame_length:
+        regions[-1, 1] = len(audio)
+    return regions.astype(np.int64)
+
+
+class TimestampMap:
+    """Maps times in the trimmed (speech-only) audio back to the original recording"""
+
+    def __init__(self, regions: np.ndarray, sample_rate: int, original_samples: int):
+        self.regions = regions
+        self.sample_rate = sample_rate
+        self.original_samples = original_samples
+        lengths = regions[:, 1] - regions[:, 0]
+        # Offset of every region inside the trimmed audio
+        self.trimmed_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(lengths) else lengths
+        self.speech_samples = int(lengths.sum())
+
+    @property
+    def original_duration(self) -> float:
+        return self.original_samples / self.sample_rate
+
+    @property
+    def speech_duration(self) -> float:
+        return self.speech_samples / self.sample_rate
+
+    @property
+    def removed_duration(self) -> float:
+        return self.original_duration - self.speech_duration
+
+    def to_original(self, seconds, side: str = "right") -> np.ndarray:
+        """Original-recording times (seconds) for times in the trimmed audio.
+
+        A time exactly on the seam between two regions maps to the start of
+        the later region with `side="right"` (segment starts) and to the end
+        of the earlier one with `side="left"` (segment ends).
+        """
+        samples = np.rint(np.asarray(seconds, dtype=np.float64) * self.sample_rate)
+        if len(self.regions) == 0:
+            return samples / self.sample_rate
+        index = np.searchsorted(self.trimmed_starts, samples, side=side) - 1
+        index = np.clip(index, 0, len(self.regions) - 1)
+        return (self.regions[index, 0] + samples - self.trimmed_starts[index]) / self.sample_rate
+
+    def stats(self) -> dict:
+        return {
+            "original_duration": self.original_duration,
+            "speech_duration": self.speech_duration,
+            "removed_duration": self.removed_duration,
+            "regions": len(self.regions),
+        }
+
+
+def trim_silence(audio: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, TimestampMap]:
+    """Concatenate the speech regions of `audio`, with a map back to the original times"""
+    regions = detect_speech(audio, sample_rate)
+    timeline = TimestampMap(regions, sample_rate, len(audio))
+    if len(regions) == 1 and regions[0, 0] == 0 and regions[0, 1] == len(audio):
+        return audio, timeline
+    if len(regions) == 0:
+        return audio[:0], timeline
+    return np.concatenate([audio[start:end] for start, end in regions]), timeline
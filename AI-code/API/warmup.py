@@ -0,0 +1,84 @@
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+
+class WarmUp:
+    """Runs start-up steps (model loads, dummy inference) on a background thread.
+
+    The web server can bind its port and answer liveness checks right away;
+    `ready` only turns true once every step has finished. A failed step
+    (e.g. a download timing out) is retried after `retry_delay` seconds,
+    doubling up to `max_retry_delay`; steps that already succeeded are not
+    run again.
+    """
+
+    def __init__(
+        self,
+        steps: List[Tuple[str, Callable[[], None]]],
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 300.0,
+    ):
+        self.steps = steps
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.state = "pending"
+        self.current_step: Optional[str] = None
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.next_attempt_at: Optional[float] = None
+        self.timings = {}
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self) -> None:
+        """Warm up in the background until it succeeds; a no-op if ready or already running"""
+        with self._lock:
+            if self.ready or (self._thread is not None and self._thread.is_alive()):
+                return
+            self.state = "warming"
+            self._thread = threading.Thread(target=self._run_until_ready, name="warm-up", daemon=True)
+            self._thread.start()
+
+    def _run_until_ready(self) -> None:
+        delay = self.retry_delay
+        while not self.run():
+            self.next_attempt_at = time.time() + delay
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+        self.next_attempt_at = None
+
+    def run(self) -> bool:
+        """Run the remaining steps once in the calling thread, e.g. in a server master before it forks"""
+        self.state = "warming"
+        self.attempts += 1
+        for name, step in self.steps:
+            if name in self.timings:
+                continue
+            self.current_step = name
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                self.state = "failed"
+                self.error = f"{name}: {str(e)}"
+                return False
+            self.timings[name] = time.perf_counter() - start
+        self.current_step = None
+        self.error = None
+        self.state = "ready"
+        return True
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "current_step": self.current_step,
+            "error": self.error,
+            "attempts": self.attempts,
+            "next_attempt_at": self.next_attempt_at,
+            "step_seconds": dict(self.timings),
+        }
@@ -0,0 +1 @@
+API/diarization.py
\ No newline at end of file
@@ -0,0 +1 @@
+API/inference_backends.py
\ No newline at end of file
@@ -0,0 +1 @@
+API/keyphrases.py
\ No newline at end of file
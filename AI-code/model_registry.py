@@ -0,0 +1 @@
+API/model_registry.py
\ No newline at end of file
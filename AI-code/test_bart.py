@@ -5,8 +5,13 @@ from datetime import datetime
 import os
 from pathlib import Path
 import soundfile as sf
-import whisper
 import time
+from model_registry import whisper_registry
+from diarization import estimate_speakers
+from keyphrases import topic_index
+
+# IDF index over past interviews, built with `python keyphrases.py build`
+topic_index.configure(os.environ.get("TOPIC_INDEX"))
 
 # Load BART tokenizer and model
 bart_model_name = "facebook/bart-large-cnn"  # Pretrained BART model for summarization
@@ -50,14 +55,22 @@ class AudioProcessor:
     def transcribe_audio(file_path: str) -> tuple[str, float]:
         """Transcribe audio file to text using OpenAI Whisper"""
         try:
-            model = whisper.load_model("base")  # Choose model size; "base" is faster
-            result = model.transcribe(file_path)
+            with whisper_registry.acquire("base") as model:  # Choose model size; "base" is faster
+                result = model.transcribe(file_path)
             transcript = result["text"]
             confidence = result.get("confidence", 0.0)  # Whisper models may not have confidence scores
             return transcript, confidence
         except Exception as e:
             raise RuntimeError(f"Audio transcription failed: {str(e)}")
 
+    @staticmethod
+    def estimate_speaker_count(wav_path: str) -> int:
+        """Estimate the number of speakers from MFCC embeddings of the audio"""
+        data, samplerate = sf.read(wav_path, dtype="float32")
+        if data.ndim > 1:
+            data = data.mean(axis=1)
+        return estimate_speakers(data, samplerate)["speaker_count"]
+
 
 class TextAnalyzer:
     """Class to handle text analysis"""
@@ -71,13 +84,8 @@ class TextAnalyzer:
 
     @staticmethod
     def extract_topics(text: str) -> List[str]:
-        """Placeholder for topic extraction"""
-        return ["Topic extraction is yet to be implemented"]
-
-    @staticmethod
-    def estimate_speaker_count(text: str) -> int:
-        """Placeholder for speaker count estimation"""
-        return 1
+        """Rank the transcript's key phrases by TF-IDF against past interviews"""
+        return topic_index.top_phrases(text)
 
 
 def analyze_audio(file_path: str) -> Summary:
@@ -92,7 +100,7 @@ def analyze_audio(file_path: str) -> Summary:
     transcript, confidence = AudioProcessor.transcribe_audio(wav_path)
     summary = TextAnalyzer.generate_summary(transcript)
     topics = TextAnalyzer.extract_topics(transcript)
-    speaker_count = TextAnalyzer.estimate_speaker_count(transcript)
+    speaker_count = AudioProcessor.estimate_speaker_count(wav_path)
 
     return Summary(
         key_points=[],
@@ -5,14 +5,25 @@ from datetime import datetime
 import os
 from pathlib import Path
 import soundfile as sf
-import whisper
 import torch
 import time
+from model_registry import WhisperModelRegistry
+from diarization import estimate_speakers
+from keyphrases import topic_index
+
+# Use the GPU when there is one so the script still runs on CPU-only nodes
+device = "cuda" if torch.cuda.is_available() else "cpu"
+
+# IDF index over past interviews, built with `python keyphrases.py build`
+topic_index.configure(os.environ.get("TOPIC_INDEX"))
 
 # Load BART tokenizer and model
 bart_model_name = "facebook/bart-large-cnn"  # Pretrained BART model for summarization
 bart_tokenizer = BartTokenizer.from_pretrained(bart_model_name)
-bart_model = BartForConditionalGeneration.from_pretrained(bart_model_name).to("cuda")  # Move BART model to GPU
+bart_model = BartForConditionalGeneration.from_pretrained(bart_model_name).to(device)  # Move BART model to GPU if available
+
+# Whisper models are loaded once per process and kept on the same device
+whisper_registry = WhisperModelRegistry(device=device)
 
 
 class Summary(BaseModel):
@@ -51,14 +62,22 @@ class AudioProcessor:
     def transcribe_audio(file_path: str) -> tuple[str, float]:
         """Transcribe audio file to text using OpenAI Whisper"""
         try:
-            model = whisper.load_model("base", device="cuda")  # Load Whisper model on GPU
-            result = model.transcribe(file_path)
+            with whisper_registry.acquire("base") as model:  # Load Whisper model once
+                result = model.transcribe(file_path)
             transcript = result["text"]
             confidence = result.get("confidence", 0.0)  # Whisper may not have confidence scores
             return transcript, confidence
         except Exception as e:
             raise RuntimeError(f"Audio transcription failed: {str(e)}")
 
+    @staticmethod
+    def estimate_speaker_count(wav_path: str) -> int:
+        """Estimate the number of speakers from MFCC embeddings of the audio"""
+        data, samplerate = sf.read(wav_path, dtype="float32")
+        if data.ndim > 1:
+            data = data.mean(axis=1)
+        return estimate_speakers(data, samplerate)["speaker_count"]
+
 
 class TextAnalyzer:
     """Class to handle text analysis"""
@@ -66,7 +85,7 @@ class TextAnalyzer:
     @staticmethod
     def generate_summary(text: str) -> str:
         """Generate a concise summary using BART model"""
-        inputs = bart_tokenizer(text, max_length=1024, return_tensors="pt", truncation=True).to("cuda")  # Move inputs to GPU
+        inputs = bart_tokenizer(text, max_length=1024, return_tensors="pt", truncation=True).to(device)  # Move inputs to the model's device
         summary_ids = bart_model.generate(
             inputs.input_ids,
             max_length=1000,
@@ -78,13 +97,8 @@ class TextAnalyzer:
 
     @staticmethod
     def extract_topics(text: str) -> List[str]:
-        """Placeholder for topic extraction"""
-        return ["Topic extraction is yet to be implemented"]
-
-    @staticmethod
-    def estimate_speaker_count(text: str) -> int:
-        """Placeholder for speaker count estimation"""
-        return 1
+        """Rank the transcript's key phrases by TF-IDF against past interviews"""
+        return topic_index.top_phrases(text)
 
 
 def analyze_audio(file_path: str) -> Summary:
@@ -99,7 +113,7 @@ def analyze_audio(file_path: str) -> Summary:
     transcript, confidence = AudioProcessor.transcribe_audio(wav_path)
     summary = TextAnalyzer.generate_summary(transcript)
     topics = TextAnalyzer.extract_topics(transcript)
-    speaker_count = TextAnalyzer.estimate_speaker_count(transcript)
+    speaker_count = AudioProcessor.estimate_speaker_count(wav_path)
 
     return Summary(
         key_points=[],
@@ -1,19 +1,37 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
 from datetime import datetime
 import os
 from pathlib import Path
 import soundfile as sf
+import numpy as np
 import spacy
-import whisper
+from spacy.attrs import ENT_IOB, ENT_TYPE, IS_STOP, POS, SENT_START
+from spacy.parts_of_speech import IDS as POS_IDS
+from spacy.tokens import Doc
 import time
+from model_registry import whisper_registry
+from diarization import estimate_speakers
+from keyphrases import topic_index
+
+# Pipeline components none of the analyzers read (they use sentences, entities,
+# noun chunks, POS tags and stop words); excluding them makes every parse cheaper
+UNUSED_COMPONENTS = ["lemmatizer"]
+
+# Entity labels that make a sentence more important than other entities do
+KEY_ENTITY_LABELS = ['PERSON', 'ORG', 'SKILL', 'PRODUCT']
+# `Doc.to_array` value of ENT_IOB for the first token of an entity
+ENT_BEGIN = 3
+
+# IDF index over past interviews, built with `python keyphrases.py build`
+topic_index.configure(os.environ.get("TOPIC_INDEX"))
 
 # Load NLP model for text analysis
 try:
-    nlp = spacy.load("en_core_web_sm")
+    nlp = spacy.load("en_core_web_sm", exclude=UNUSED_COMPONENTS)
 except OSError:
     os.system("python -m spacy download en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
+    nlp = spacy.load("en_core_web_sm", exclude=UNUSED_COMPONENTS)
 
 class Summary(BaseModel):
     key_points: List[str]
@@ -50,98 +68,138 @@ class AudioProcessor:
     def transcribe_audio(file_path: str) -> tuple[str, float]:
         """Transcribe audio file to text using OpenAI Whisper"""
         try:
-            model = whisper.load_model("base")  # Choose model size; "base" is faster
-            result = model.transcribe(file_path)
+            with whisper_registry.acquire("base") as model:  # Choose model size; "base" is faster
+                result = model.transcribe(file_path)
             transcript = result["text"]
             confidence = result.get("confidence", 0.0)  # Whisper models may not have confidence scores
             return transcript, confidence
         except Exception as e:
             raise RuntimeError(f"Audio transcription failed: {str(e)}")
 
+    @staticmethod
+    def estimate_speaker_count(wav_path: str) -> int:
+        """Estimate the number of speakers from MFCC embeddings of the audio"""
+        data, samplerate = sf.read(wav_path, dtype="float32")
+        if data.ndim > 1:
+            data = data.mean(axis=1)
+        return estimate_speakers(data, samplerate)["speaker_count"]
+
 class TextAnalyzer:
-    """Class to handle text analysis"""
-    
+    """Class to handle text analysis
+
+    Every analyzer accepts either raw text or an already parsed `Doc`, so a
+    transcript only has to go through the spaCy pipeline once.
+    """
+
     @staticmethod
-    def extract_key_points(text: str) -> List[str]:
+    def parse(text: Union[str, Doc]) -> Doc:
+        """Run the spaCy pipeline unless the text is already parsed"""
+        return text if isinstance(text, Doc) else nlp(text)
+
+    @staticmethod
+    def score_sentences(
+        doc: Doc,
+        key_entity_weight: int,
+        content_pos: Sequence[str] = (),
+        chunk_root_pos: Sequence[str] = (),
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Sentence start offsets and scores, from one `Doc.to_array` export.
+
+        Every entity adds `key_entity_weight` (KEY_ENTITY_LABELS) or 1,
+        every non-stop token with a `content_pos` tag adds 1 and every noun
+        chunk whose root has a `chunk_root_pos` tag adds 1. Token weights are
+        summed per sentence with `np.add.reduceat`.
+        """
+        attrs = doc.to_array([SENT_START, IS_STOP, POS, ENT_IOB, ENT_TYPE]).astype(np.int64)
+        sent_start, is_stop, pos, ent_iob, ent_type = attrs.T
+        starts = np.flatnonzero(sent_start == 1)
+        if len(starts) == 0 or starts[0] != 0:
+            starts = np.concatenate(([0], starts))
+
+        # Same uint64 -> int64 cast as the exported array, so label hashes still match
+        key_types = np.array(
+            [doc.vocab.strings.add(label) for label in KEY_ENTITY_LABELS], dtype=np.uint64
+        ).astype(np.int64)
+        weights = np.where(
+            ent_iob == ENT_BEGIN, np.where(np.isin(ent_type, key_types), key_entity_weight, 1), 0
+        )
+        if content_pos:
+            weights += (is_stop == 0) & np.isin(pos, [POS_IDS[tag] for tag in content_pos])
+        scores = np.add.reduceat(weights, starts)
+
+        if chunk_root_pos:
+            roots = np.fromiter((chunk.root.i for chunk in doc.noun_chunks), dtype=np.int64)
+            roots = roots[np.isin(pos[roots], [POS_IDS[tag] for tag in chunk_root_pos])]
+            sentence_of_root = np.searchsorted(starts, roots, side="right") - 1
+            scores += np.bincount(sentence_of_root, minlength=len(starts))
+        return starts, scores
+
+    @staticmethod
+    def top_sentences(doc: Doc, starts: np.ndarray, scores: np.ndarray, k: int) -> List[str]:
+        """Text of the `k` best sentences, in the order they were spoken"""
+        if len(scores) > k:
+            best = np.sort(np.argpartition(-scores, k - 1)[:k])
+        else:
+            best = np.arange(len(scores))
+        ends = np.append(starts[1:], len(doc))
+        return [doc[starts[i]:ends[i]].text for i in best]
+
+    @staticmethod
+    def extract_key_points(text: Union[str, Doc]) -> List[str]:
         """Extract key points from the text using NLP"""
-        doc = nlp(text)
-        key_sentences = []
-        
-        scores = {}
-        for sent in doc.sents:
-            score = sum([
-                2 if ent.label_ in ['PERSON', 'ORG', 'SKILL', 'PRODUCT'] else 1
-                for ent in sent.ents
-            ]) + sum([
-                1 for chunk in sent.noun_chunks
-                if chunk.root.pos_ in ['VERB', 'NOUN']
-            ])
-            scores[sent] = score
-        
-        sorted_sents = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        key_sentences = [sent.text for sent, score in sorted_sents[:5]]
-        
-        return key_sentences
+        doc = TextAnalyzer.parse(text)
+        if len(doc) == 0:
+            return []
+        starts, scores = TextAnalyzer.score_sentences(
+            doc, key_entity_weight=2, chunk_root_pos=['VERB', 'NOUN']
+        )
+        return TextAnalyzer.top_sentences(doc, starts, scores, 5)
 
     @staticmethod
-    def generate_summary(text: str) -> str:
+    def generate_summary(text: Union[str, Doc]) -> str:
         """Generate a concise summary of the interview"""
-        doc = nlp(text)
-        sentence_scores = {}
-        for sent in doc.sents:
-            score = sum([
-                3 if ent.label_ in ['PERSON', 'ORG', 'SKILL', 'PRODUCT'] else 1
-                for ent in sent.ents
-            ]) + sum([
-                1 for token in sent
-                if not token.is_stop and token.pos_ in ['VERB', 'NOUN', 'ADJ']
-            ])
-            sentence_scores[sent.text] = score
-        
-        summary_sentences = sorted(
-            sentence_scores.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:3]
-        
-        return " ".join([sent for sent, score in summary_sentences])
+        doc = TextAnalyzer.parse(text)
+        if len(doc) == 0:
+            return ""
+        starts, scores = TextAnalyzer.score_sentences(
+            doc, key_entity_weight=3, content_pos=['VERB', 'NOUN', 'ADJ']
+        )
+        return " ".join(TextAnalyzer.top_sentences(doc, starts, scores, 3))
 
     @staticmethod
-    def extract_topics(text: str) -> List[str]:
+    def extract_topics(text: Union[str, Doc]) -> List[str]:
         """Extract main topics discussed in the interview"""
-        doc = nlp(text)
-        topics = {}
-        
-        for ent in doc.ents:
-            if ent.label_ in ['SKILL', 'PRODUCT', 'ORG', 'TOPIC', 'PERSON', 'EVENT']:
-                topic_text = ent.text.lower()
-                topics[topic_text] = topics.get(topic_text, 0) + 1
-        
-        for chunk in doc.noun_chunks:
-            if len(chunk.text.split()) <= 3:
-                topic_text = chunk.text.lower()
-                if chunk.root.pos_ in ['NOUN', 'PROPN']:
-                    topics[topic_text] = topics.get(topic_text, 0) + 1
-        
-        sorted_topics = sorted(topics.items(), key=lambda x: x[1], reverse=True)
-        return [topic for topic, freq in sorted_topics[:5]]
+        doc = TextAnalyzer.parse(text)
+        # Named entities and short noun chunks are the candidates; the shared
+        # TF-IDF index ranks them against the rest of the interview corpus
+        candidates = [
+            ent.text for ent in doc.ents
+            if ent.label_ in ['SKILL', 'PRODUCT', 'ORG', 'TOPIC', 'PERSON', 'EVENT']
+        ]
+        candidates += [
+            chunk.text for chunk in doc.noun_chunks
+            if len(chunk) <= 3 and chunk.root.pos_ in ['NOUN', 'PROPN']
+        ]
+        return topic_index.top_phrases(doc.text, k=5, candidates=candidates)
+
+    @staticmethod
+    def analyze(doc: Doc) -> dict:
+        """Run every text analyzer over one parsed transcript; speakers are counted from the audio"""
+        return {
+            "key_points": TextAnalyzer.extract_key_points(doc),
+            "summary": TextAnalyzer.generate_summary(doc),
+            "topics": TextAnalyzer.extract_topics(doc),
+        }
 
     @staticmethod
-    def estimate_speaker_count(text: str) -> int:
-        """Estimate the number of speakers in the conversation"""
-        doc = nlp(text)
-        speaker_indicators = set()
-        
-        for ent in doc.ents:
-            if ent.label_ == 'PERSON':
-                speaker_indicators.add(ent.text.lower())
-        
-        pronouns = {'i', 'you', 'he', 'she', 'they'}
-        for token in doc:
-            if token.text.lower() in pronouns:
-                speaker_indicators.add(token.text.lower())
-        
-        return max(len(speaker_indicators), 1)
+    def analyze_many(
+        texts: Iterable[str], n_process: int = os.cpu_count() or 1, batch_size: int = 16
+    ) -> List[dict]:
+        """Batch mode: parse many transcripts with `nlp.pipe` across processes"""
+        return [
+            TextAnalyzer.analyze(doc)
+            for doc in nlp.pipe(texts, n_process=n_process, batch_size=batch_size)
+        ]
 
 def analyze_audio(file_path: str) -> Summary:
     """Complete audio analysis pipeline"""
@@ -153,20 +211,19 @@ def analyze_audio(file_path: str) -> Summary:
 
     duration = AudioProcessor.get_audio_duration(wav_path)
     transcript, confidence = AudioProcessor.transcribe_audio(wav_path)
-    key_points = TextAnalyzer.extract_key_points(transcript)
-    summary = TextAnalyzer.generate_summary(transcript)
-    topics = TextAnalyzer.extract_topics(transcript)
-    speaker_count = TextAnalyzer.estimate_speaker_count(transcript)
+    # Parse once and share the Doc between all analyzers
+    analysis = TextAnalyzer.analyze(TextAnalyzer.parse(transcript))
 
     return Summary(
-        key_points=key_points,
-        summary=summary,
-        topics_discussed=topics,
+        key_points=analysis["key_points"],
+        summary=analysis["summary"],
+        topics_discussed=analysis["topics"],
         duration=duration,
         interview_date=datetime.now(),
         transcript=transcript,
         confidence_score=confidence,
-        speaker_count=speaker_count
+        # Count voices in the audio rather than pronouns in the transcript
+        speaker_count=AudioProcessor.estimate_speaker_count(wav_path)
     )
 
 def test_analyze_audio():
@@ -12,8 +12,9 @@ const uploadAudio = async (req, res) => {
 
     console.log('Received Base64 audio data.');
 
-    // Pass the audio data to the AudioService for processing
-    const response = await AudioService.processAudio(audio);
+    // Pass the audio data to the AudioService for processing, on behalf of
+    // the user authenticated by the JWT middleware
+    const response = await AudioService.processAudio(audio, req.user.emailid);
 
     // Send the response back to the client
     res.json(response);
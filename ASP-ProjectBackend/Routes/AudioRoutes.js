@@ -1,8 +1,9 @@
 const express = require('express');
 const router = express.Router();
 const { uploadAudio} = require('../Controllers/AudioController');
+const authenticateToken = require('../Middleware/Auth');
 
-// POST route to handle audio upload
-router.post('/upload-audio',  uploadAudio);
+// POST route to handle audio upload; results are stored in the user's history
+router.post('/upload-audio', authenticateToken, uploadAudio);
 
 module.exports = router;
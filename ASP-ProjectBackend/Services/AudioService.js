@@ -1,9 +1,30 @@
+const crypto = require('crypto');
 const fs = require('fs');
 const path = require('path');
 const fetch = require('node-fetch'); // To forward the audio to the Flask API (if needed)
-const FormData = require('form-data'); // To create multipart/form-data requests
 
-const processAudio = async (base64Audio) => {
+// Shared with the Flask API, which only trusts a user id signed with it
+const USER_SIGNING_SECRET = process.env.WHISPER_USER_SIGNING_SECRET;
+
+// Headers naming the user a request is made for: the id, the current time and
+// an HMAC-SHA256 over both. Flask rejects signatures older than a few minutes
+const userHeaders = (userId) => {
+  if (!userId || !USER_SIGNING_SECRET) {
+    return {};
+  }
+  const timestamp = Math.floor(Date.now() / 1000).toString();
+  const signature = crypto
+    .createHmac('sha256', USER_SIGNING_SECRET)
+    .update(`${userId}.${timestamp}`)
+    .digest('hex');
+  return {
+    'X-User-Id': userId,
+    'X-User-Timestamp': timestamp,
+    'X-User-Signature': signature,
+  };
+};
+
+const processAudio = async (base64Audio, userId) => {
   try {
     // Decode the Base64 string into a Buffer (binary data)
     const audioBuffer = Buffer.from(base64Audio, 'base64');
@@ -13,7 +34,7 @@ const processAudio = async (base64Audio) => {
     fs.writeFileSync(audioPath, audioBuffer);
 
     // Optionally, forward the audio to a Flask API (if needed)
-    const flaskResponse = await forwardToFlaskAPI(audioBuffer);
+    const flaskResponse = await forwardToFlaskAPI(audioBuffer, userId);
 
     // Return a successful response after processing
     return {
@@ -27,36 +48,63 @@ const processAudio = async (base64Audio) => {
   }
 };
 
-const forwardToFlaskAPI = async (audioBuffer) => {
+const forwardToFlaskAPI = async (audioBuffer, userId) => {
   try {
     // Log the length of the audio buffer to ensure it's not empty
     console.log('Audio buffer size:', audioBuffer.length);
 
-    // Create a FormData object and append the audio file
-    const formData = new FormData();
-    formData.append('audio_file', audioBuffer, { filename: 'audio.webm', contentType: 'audio/webm' });
-
-    // Log FormData to check if the audio is correctly attached
-    console.log('FormData object:', formData);
-
-    // Make the API request to Flask
-    const response = await fetch(`${process.env.WHISPER_URL}/api/process_audio`, {
+    // Submit the audio as a job; Flask answers right away with a job ID.
+    // The raw body avoids multipart encoding; X-Filename tells Flask the format
+    const response = await fetch(`${process.env.WHISPER_URL}/api/jobs`, {
       method: 'POST',
-      body: formData, // Send FormData (multipart)
+      headers: {
+        'Content-Type': 'application/octet-stream',
+        'X-Filename': 'audio.webm',
+        ...userHeaders(userId),
+      },
+      body: audioBuffer,
     });
 
     if (!response.ok) {
       throw new Error('Failed to forward audio to Flask API');
     }
 
-    // Return Flask response data
-    return await response.json();
+    const { job_id: jobId } = await response.json();
+
+    // Poll the job until the pipeline finishes and return its result
+    return await waitForFlaskJob(jobId);
   } catch (error) {
     console.error('Error forwarding audio to Flask API:', error);
     throw new Error('Error forwarding audio to Flask');
   }
 };
 
+const JOB_POLL_INTERVAL_MS = 2000;
+// Longest wait for a job to finish, including its time in Flask's queue
+const JOB_TIMEOUT_MS = Number(process.env.WHISPER_JOB_TIMEOUT_MS) || 30 * 60 * 1000;
+
+const waitForFlaskJob = async (jobId) => {
+  const deadline = Date.now() + JOB_TIMEOUT_MS;
+  for (;;) {
+    const response = await fetch(`${process.env.WHISPER_URL}/api/jobs/${jobId}`);
+    if (!response.ok) {
+      throw new Error(`Failed to fetch status of job ${jobId}`);
+    }
+
+    const job = await response.json();
+    if (job.status === 'completed') {
+      return job.result;
+    }
+    if (job.status === 'failed') {
+      throw new Error(`Audio processing job failed: ${job.error}`);
+    }
+    if (Date.now() >= deadline) {
+      throw new Error(`Audio processing job ${jobId} did not finish within ${JOB_TIMEOUT_MS} ms (status: ${job.status})`);
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+};
 
 module.exports = {
   processAudio,